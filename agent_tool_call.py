@@ -10,6 +10,8 @@ from autogen_core import CancellationToken
 import os
 from dotenv import load_dotenv
 from duckduckgo import base_url, params, url
+from async_console import StdinReader
+from model_client import MODEL_STREAM, get_model_client
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.conditions import HandoffTermination, TextMentionTermination
 
@@ -32,16 +34,14 @@ async def main() -> None:
     )
 
     # Create an agent that can use the translation tool
-    model_client = OpenAIChatCompletionClient(
-        model="gemini-1.5-flash-8b",
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
+    model_client = get_model_client()
 
     agent = AssistantAgent(
         name="search_agent",
         model_client=model_client,
         tools=[adapter],
         system_message="You are the helpful web scrapping agent. your task is to search query into web based on user query",
+        model_client_stream=MODEL_STREAM,
     )
     
     user_proxy = UserProxyAgent("user_proxy", input_func=input)
@@ -52,14 +52,15 @@ async def main() -> None:
     team = RoundRobinGroupChat([agent], max_turns=1)
 
     task = "Write a 4-line poem about the ocean."
+    reader = StdinReader()
     while True:
-        # Run the conversation and stream to the console.
+        # Run the conversation and stream to the console (already inside the event loop, so await it)
         stream = team.run_stream(task=task)
-        # Use asyncio.run(...) when running in a script.
-        asyncio.run(Console(stream))
-        # Get the user response.
-        task = input("Enter your feedback (type 'exit' to leave): ")
-        if task.lower().strip() == "exit":
+        await Console(stream)
+        # Get the user response without blocking the event loop
+        print("Enter your feedback (type 'exit' to leave): ", end="", flush=True)
+        task = await reader.readline()
+        if task is None or task.lower().strip() == "exit":
             break
     # Let the agent translate some text
     # await Console(
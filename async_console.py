@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import os
+import signal
+import sys
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from autogen_agentchat.base import Response, TaskResult
+from autogen_agentchat.messages import BaseChatMessage, ModelClientStreamingChunkEvent
+from dotenv import load_dotenv
+
+from deadline import QueryCancellation
+from event_sink import get_event_sink
+
+load_dotenv()
+
+REPL_CONCURRENCY = int(os.getenv("REPL_CONCURRENCY", "1"))  # Queries answered at once; 1 queues them in order
+EXIT_COMMANDS = ("exit", "quit", "bye")
+CANCEL_COMMAND = "cancel"
+
+
+class StdinReader:
+    """Read stdin lines on a daemon thread and hand them to the event loop.
+
+    The loop never blocks on the terminal, and because the thread is a daemon
+    a pending read does not keep the process alive at exit.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._lines: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        threading.Thread(target=self._read, name="stdin-reader", daemon=True).start()
+
+    def _read(self):
+        for line in sys.stdin:
+            self._loop.call_soon_threadsafe(self._lines.put_nowait, line.rstrip("\n"))
+        self._loop.call_soon_threadsafe(self._lines.put_nowait, None)
+
+    async def readline(self) -> Optional[str]:
+        """Next line typed by the user, or None at end of input"""
+        return await self._lines.get()
+
+    def push(self, line: Optional[str]):
+        """Inject a line as if the user had typed it"""
+        self._lines.put_nowait(line)
+
+
+class LabeledRenderer:
+    """Render a run_stream with every line prefixed by a label, so concurrent runs stay readable.
+
+    Token chunks are buffered until a full line is available instead of being
+    printed inline, where they would interleave with other runs mid-line.
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self._partial = ""
+
+    def _print(self, text: str):
+        for line in text.splitlines() or [""]:
+            print(f"[{self.label}] {line}", flush=True)
+
+    def _flush_partial(self):
+        if self._partial:
+            self._print(self._partial)
+            self._partial = ""
+
+    async def __call__(self, stream: AsyncIterator) -> Optional[TaskResult | Response]:
+        last = None
+        streamed = False
+        async for event in stream:
+            if isinstance(event, (TaskResult, Response)):
+                last = event
+                continue
+            if isinstance(event, ModelClientStreamingChunkEvent):
+                streamed = True
+                *lines, self._partial = (self._partial + event.content).split("\n")
+                for line in lines:
+                    self._print(line)
+                continue
+            self._flush_partial()
+            if streamed and isinstance(event, BaseChatMessage):
+                # The full message repeats what the chunks already showed
+                streamed = False
+                continue
+            self._print(f"{event.source}: {event.to_text()}")
+        self._flush_partial()
+        return last
+
+
+async def run_repl(
+    handle: Callable[[str, Callable, QueryCancellation], Awaitable[None]],
+    concurrency: int = REPL_CONCURRENCY,
+    prompt: str = "You: ",
+):
+    """Read questions without blocking the event loop and answer them with `handle(query, render, cancellation)`.
+
+    The user can type the next question while one is still streaming: with
+    `concurrency` 1 questions are queued and answered in order through the
+    configured event sink; above 1 they run side by side, each rendered with
+    a `[#n]` label. Each query runs under its own QueryCancellation: typing
+    "cancel" or pressing Ctrl-C stops the queries in flight without leaving
+    the REPL, and Ctrl-C with nothing running quits. Returns when the user
+    types exit, cancelling queries that are still waiting or running, or once
+    stdin closes and all have finished.
+    """
+    reader = StdinReader()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    tasks: set[asyncio.Task] = set()
+    in_flight: set[QueryCancellation] = set()
+    count = 0
+
+    async def answer(query: str, label: str):
+        async with slots:
+            render = get_event_sink() if concurrency <= 1 else LabeledRenderer(label)
+            cancellation = QueryCancellation()
+            in_flight.add(cancellation)
+            try:
+                await handle(query, render, cancellation)
+            except Exception as e:
+                print(f"❌ Error ({label}): {e}")
+            finally:
+                in_flight.discard(cancellation)
+                cancellation.close()
+        if len(tasks) <= 1:
+            print(prompt, end="", flush=True)
+
+    def cancel_in_flight() -> int:
+        for cancellation in in_flight:
+            cancellation.cancel()
+        return len(in_flight)
+
+    def on_interrupt():
+        if cancel_in_flight():
+            print("\n🛑 Cancelling the current query (Ctrl-C again with nothing running quits)")
+        else:
+            reader.push(EXIT_COMMANDS[0])
+
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_interrupt)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass  # No signal handlers on this platform: Ctrl-C keeps its default behaviour
+
+    print(prompt, end="", flush=True)
+    while True:
+        line = await reader.readline()
+        if line is None:
+            # End of input (e.g. piped questions): let the queued ones finish
+            await asyncio.gather(*tasks, return_exceptions=True)
+            break
+        if line.strip().lower() in EXIT_COMMANDS:
+            break
+        if line.strip().lower() == CANCEL_COMMAND:
+            if not cancel_in_flight():
+                print("Nothing to cancel.")
+                print(prompt, end="", flush=True)
+            continue
+        query = line.strip()
+        if not query:
+            print("Please enter a valid query.")
+            print(prompt, end="", flush=True)
+            continue
+
+        count += 1
+        label = f"#{count}"
+        if tasks and concurrency <= 1:
+            print(f"📥 Queued {label}: {query}")
+        task = asyncio.create_task(answer(query, label))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+        loop.remove_signal_handler(signal.SIGINT)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        print(f"\n🛑 Cancelled {len(tasks)} unfinished quer{'y' if len(tasks) == 1 else 'ies'}")
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -11,6 +11,21 @@ from autogen_agentchat.ui import Console
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_core import CancellationToken
 from urllib.parse import urlencode
+from schema_cache import get_tool_adapter
+from context_budget import create_model_context
+from model_client import MODEL_STREAM, close_model_client, get_model_client
+from search_cache import cache_key, close_search_caches, format_cache_stats, with_search_cache
+from single_flight import with_single_flight
+from resilience import format_latency_stats, with_resilience
+from result_compaction import format_compaction_stats, with_compaction
+from completion_cache import format_completion_cache_stats
+from local_index import format_local_index_stats, local_search_hint, local_search_tools, with_local_index
+from prefetch import SpeculativeSearchTool, format_prefetch_stats, with_prefetch
+from async_console import REPL_CONCURRENCY, run_repl
+from deadline import QueryCancellation, report_outcome, run_with_deadline
+from event_sink import close_event_sink, get_event_sink
+from mcp_pool import close_mcp_pools
+from tracing import query_span, setup_tracing, traced_stream
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +36,17 @@ MCP_PARAMS = {"api_key": "a9a64c1b-ddb1-4503-bb49-dfd7ab938c7b"}
 MCP_URL = f"{BASE_URL}?{urlencode(MCP_PARAMS)}"
 
 
+SEARCH_SYSTEM_MESSAGE = """You are a helpful web search agent. Your task is to search the web based on user queries using the DuckDuckGo search tool.
+
+When a user asks a question:
+1. Use the search tool to find relevant information
+2. Analyze the search results
+3. Provide a comprehensive and accurate answer based on the search results
+4. Always cite your sources when possible
+
+You have access to a search tool that can help you find current information on the web."""
+
+
 class AutoGenMCPAgent:
     """AutoGen Agent with MCP Tool Integration"""
     
@@ -30,6 +56,7 @@ class AutoGenMCPAgent:
         self.user_proxy = None
         self.team = None
         self.search_tool_adapter = None
+        self.local_tools = []
     
     async def initialize(self):
         """Initialize the AutoGen agent with MCP tools"""
@@ -43,38 +70,30 @@ class AutoGenMCPAgent:
                 terminate_on_close=True,
             )
             
-            # Get the search tool from the MCP server
-            self.search_tool_adapter = await StreamableHttpMcpToolAdapter.from_server_params(
-                server_params, "search"
-            )
+            # Get the search tool, from the local schema cache when possible,
+            # serve repeated queries from the result cache, coalesce identical
+            # in-flight searches into one remote call and hedge/retry slow or
+            # failed searches; optionally start each search before the model asks.
+            # The model sees compacted results while the caches keep the raw ones,
+            # and results fetched from the server (not cache hits) are added to
+            # the local index behind local_search
+            search_adapter = await get_tool_adapter(server_params, "search")
+            self.search_tool_adapter = with_prefetch(with_compaction(with_search_cache(with_single_flight(
+                with_local_index(with_resilience(search_adapter, idempotent=True)), key_fn=cache_key
+            ))))
+            self.local_tools = [with_compaction(tool) for tool in local_search_tools()]
             
-            # Create the model client (same as your original setup)
-            self.model_client = OpenAIChatCompletionClient(
-                model="gemini-1.5-flash-8b",
-                api_key=os.getenv("GEMINI_API_KEY"),
-            )
+            # Use the shared rate-limited model client
+            self.model_client = get_model_client()
             
             # Create the search agent with MCP tool
-            self.search_agent = AssistantAgent(
-                name="search_agent",
-                model_client=self.model_client,
-                tools=[self.search_tool_adapter],
-                system_message="""You are a helpful web search agent. Your task is to search the web based on user queries using the DuckDuckGo search tool.
-
-When a user asks a question:
-1. Use the search tool to find relevant information
-2. Analyze the search results
-3. Provide a comprehensive and accurate answer based on the search results
-4. Always cite your sources when possible
-
-You have access to a search tool that can help you find current information on the web."""
-            )
+            self.search_agent = self.create_search_agent()
             
             # Create user proxy agent (simplified for AutoGen 0.7.4)
             self.user_proxy = UserProxyAgent(name="user_proxy")
             
             # Create team with the search agent
-            self.team = RoundRobinGroupChat([self.search_agent], max_turns=3)
+            self.team = self.create_team(self.search_agent)
             
             print("✅ AutoGen MCP Agent initialized successfully!")
             return True
@@ -83,50 +102,99 @@ You have access to a search tool that can help you find current information on t
             print(f"❌ Error initializing agent: {e}")
             return False
     
-    async def search_and_respond(self, query: str):
-        """Search for information and provide a response"""
+    def create_search_agent(self) -> AssistantAgent:
+        """Create a search agent sharing the model client and MCP tool"""
+        return AssistantAgent(
+            name="search_agent",
+            model_client=self.model_client,
+            tools=[self.search_tool_adapter, *self.local_tools],
+            system_message=SEARCH_SYSTEM_MESSAGE + local_search_hint(self.local_tools),
+            model_client_stream=MODEL_STREAM,
+            model_context=create_model_context(self.model_client),
+        )
+    
+    def create_team(self, search_agent: AssistantAgent = None) -> RoundRobinGroupChat:
+        """Create a team with its own conversation state; a new agent is made if none is given"""
+        return RoundRobinGroupChat([search_agent or self.create_search_agent()], max_turns=3)
+    
+    async def search_and_respond(
+        self,
+        query: str,
+        render=None,
+        team: RoundRobinGroupChat = None,
+        cancellation: QueryCancellation = None,
+    ):
+        """Search for information and provide a response.
+
+        `render` consumes the event stream (the configured sink by default) and
+        `team` overrides the shared conversation, e.g. for concurrent queries.
+        The query stops when `cancellation` is cancelled or its deadline passes,
+        and the best partial answer is shown.
+        """
         try:
             print(f"\n🔍 Processing query: {query}")
+            cancellation = cancellation or QueryCancellation()
             
-            # Run the conversation with the search agent
-            stream = self.team.run_stream(task=query)
-            await Console(stream)
+            # Run the conversation with the search agent, traced per phase
+            with query_span(query):
+                # Speculatively search for the raw question while the model decides what to search for
+                prefetch = None
+                if isinstance(self.search_tool_adapter, SpeculativeSearchTool):
+                    prefetch = self.search_tool_adapter.prefetch(query, cancellation.token)
+                try:
+                    outcome = await run_with_deadline(
+                        team or self.team,
+                        query,
+                        render=lambda stream: (render or get_event_sink())(traced_stream(stream)),
+                        cancellation=cancellation,
+                        create_team=self.create_team if team is None else None,
+                    )
+                finally:
+                    if prefetch is not None:
+                        self.search_tool_adapter.finish(prefetch)
+            if outcome.team is not None:
+                # A cancelled team cannot run again; continue from the state before this query
+                self.team = outcome.team
+            report_outcome(outcome, cancellation)
             
         except Exception as e:
             print(f"❌ Error during search: {e}")
     
+    def print_cache_stats(self):
+        """Print cache, prefetch, compaction and local index counters and tool latencies, if recorded"""
+        tool = self.search_tool_adapter
+        for stats in (
+            format_cache_stats(tool),
+            format_prefetch_stats(tool),
+            format_latency_stats([tool]),
+            format_compaction_stats([tool]),
+            format_completion_cache_stats(self.model_client),
+            format_local_index_stats(),
+        ):
+            if stats:
+                print(stats)
+    
     async def interactive_chat(self):
         """Start an interactive chat session"""
         print("\n🤖 AutoGen MCP Search Agent Ready!")
         print("Type your questions and I'll search the web for answers.")
-        print("Type 'exit' to quit.\n")
+        print("Type 'exit' to quit or 'cancel' (Ctrl-C) to stop the current answer; you can type the next question while one is streaming.\n")
+        
+        async def handle(query: str, render, cancellation: QueryCancellation):
+            # Queries answered side by side each get their own conversation
+            team = None if REPL_CONCURRENCY <= 1 else self.create_team()
+            await self.search_and_respond(query, render=render, team=team, cancellation=cancellation)
+            print("\n" + "="*50 + "\n")
         
-        while True:
-            try:
-                # Get user input
-                user_query = input("You: ").strip()
-                
-                if user_query.lower() in ['exit', 'quit', 'bye']:
-                    print("👋 Goodbye!")
-                    break
-                
-                if not user_query:
-                    print("Please enter a valid query.")
-                    continue
-                
-                # Process the query
-                await self.search_and_respond(user_query)
-                print("\n" + "="*50 + "\n")
-                
-            except KeyboardInterrupt:
-                print("\n👋 Goodbye!")
-                break
-            except Exception as e:
-                print(f"❌ Error: {e}")
+        await run_repl(handle)
+        self.print_cache_stats()
+        print("👋 Goodbye!")
 
 
 async def main():
     """Main function to run the AutoGen MCP Agent"""
+    setup_tracing()
+
     # Create and initialize the agent
     agent = AutoGenMCPAgent()
     
@@ -134,6 +202,10 @@ async def main():
     if await agent.initialize():
         # Start interactive chat
         await agent.interactive_chat()
+        await close_event_sink()
+        await close_mcp_pools()
+        await close_model_client()
+        close_search_caches()
     else:
         print("Failed to initialize the agent. Please check your configuration.")
 
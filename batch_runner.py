@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Iterator, Optional
+
+from autogen_agentchat.base import TaskResult, Team
+from autogen_agentchat.messages import BaseChatMessage, ToolCallExecutionEvent, ToolCallRequestEvent
+from dotenv import load_dotenv
+
+from deadline import run_with_deadline
+from event_sink import JsonlEventSink
+from tracing import query_span, setup_tracing
+
+load_dotenv()
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def iter_queries(input_path: str) -> Iterator[dict]:
+    """Stream query records from a JSONL file.
+
+    Each line is an object with a "query" (or "task") field and an optional
+    "id"; lines without an id are numbered by their position in the file.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            query = record.get("query") or record.get("task")
+            if not query:
+                print(f"⚠️ Skipping line {line_number + 1}: no query")
+                continue
+            yield {"id": str(record.get("id", line_number)), "query": query}
+
+
+def load_completed_ids(output_path: str) -> set[str]:
+    """Ids already answered successfully in a previous run (the output file is the checkpoint)"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a partial last line behind
+                continue
+            if result.get("status") == "ok":
+                completed.add(str(result["id"]))
+    return completed
+
+
+def summarize_result(task_result: TaskResult) -> dict:
+    """Extract the final answer, tool calls and token usage from a team run"""
+    tool_calls = {}
+    prompt_tokens = completion_tokens = 0
+    answer = None
+
+    for message in task_result.messages:
+        if message.models_usage is not None:
+            prompt_tokens += message.models_usage.prompt_tokens
+            completion_tokens += message.models_usage.completion_tokens
+        if isinstance(message, ToolCallRequestEvent):
+            for call in message.content:
+                tool_calls[call.id] = {"name": call.name, "arguments": call.arguments}
+        elif isinstance(message, ToolCallExecutionEvent):
+            for execution in message.content:
+                tool_calls.setdefault(execution.call_id, {"name": execution.name})["is_error"] = execution.is_error
+        elif isinstance(message, BaseChatMessage) and message.source != "user":
+            answer = message.to_text()
+
+    return {
+        "answer": answer,
+        "tool_calls": list(tool_calls.values()),
+        "stop_reason": task_result.stop_reason,
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+    }
+
+
+async def run_query(create_team: Callable[[], Team], record: dict, sink: Optional[JsonlEventSink] = None) -> dict:
+    """Run one query through a fresh team and return its output record; events go to `sink` if given"""
+    start = time.perf_counter()
+    with query_span(record["query"]) as span:
+        try:
+            render = None if sink is None else (lambda stream: sink(stream, run_id=str(record["id"])))
+            outcome = await run_with_deadline(create_team(), record["query"], render=render)
+            if outcome.cancelled:
+                # Past the deadline: keep whatever answer the run had produced
+                result = {"id": record["id"], "query": record["query"], "status": "timeout", "answer": outcome.partial}
+            else:
+                result = {"id": record["id"], "query": record["query"], "status": "ok", **summarize_result(outcome.result)}
+        except Exception as e:
+            result = {"id": record["id"], "query": record["query"], "status": "error", "error": str(e)}
+    result["timings"] = {"total_s": round(time.perf_counter() - start, 3)}
+    # Per-phase breakdown, when tracing is enabled
+    if getattr(span, "summary", None):
+        result["timings"]["phases"] = span.summary
+    return result
+
+
+async def run_batch(
+    input_path: Optional[str],
+    output_path: str,
+    create_team: Callable[[], Team],
+    concurrency: int = BATCH_CONCURRENCY,
+    records: Optional[Iterator[dict]] = None,
+    sink: Optional[JsonlEventSink] = None,
+) -> dict:
+    """Run every query from `input_path` (or `records`) with at most `concurrency` teams in flight.
+
+    Results are appended to `output_path` as each query completes; queries that
+    already have an "ok" result there are skipped, so a crashed run can resume.
+    Returns throughput statistics.
+    """
+    completed = load_completed_ids(output_path)
+    if completed:
+        print(f"⏩ Resuming: {len(completed)} queries already done")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"ok": 0, "error": 0, "timeout": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        async def worker():
+            while True:
+                record = await queue.get()
+                if record is None:
+                    return
+                result = await run_query(create_team, record, sink)
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                stats[result["status"]] += 1
+                icon = {"ok": "✅", "timeout": "⏰"}.get(result["status"], "❌")
+                print(f"{icon} [{record['id']}] {result['timings']['total_s']:.2f}s")
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for record in records if records is not None else iter_queries(input_path):
+                if record["id"] in completed:
+                    stats["skipped"] += 1
+                    continue
+                await queue.put(record)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    elapsed = time.perf_counter() - start
+    done = stats["ok"] + stats["error"] + stats["timeout"]
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["queries_per_minute"] = round(done / elapsed * 60, 2) if elapsed > 0 else 0.0
+    return stats
+
+
+def print_stats(stats: dict):
+    print("\n" + "=" * 50)
+    print(
+        f"📊 {stats['ok']} ok, {stats['error']} failed, {stats['timeout']} timed out, {stats['skipped']} skipped "
+        f"in {stats['elapsed_s']:.1f}s → {stats['queries_per_minute']:.1f} queries/min"
+    )
+
+
+async def main():
+    """Run AutoGenMCPAgent headlessly over a JSONL query file"""
+    from autogen_mcp_agent import AutoGenMCPAgent
+    from completion_cache import format_completion_cache_stats
+    from http_pool import close_http_pool
+    from mcp_pool import close_mcp_pools
+    from search_cache import close_search_caches
+
+    parser = argparse.ArgumentParser(description="Run the search agent over a JSONL file of queries")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"query\"} object per line")
+    parser.add_argument("output", help="JSONL file results are appended to (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--events", help="Also record every run's events to this JSONL file")
+    args = parser.parse_args()
+
+    setup_tracing()
+    agent = AutoGenMCPAgent()
+    if not await agent.initialize():
+        print("Failed to initialize the agent. Please check your configuration.")
+        return
+
+    sink = JsonlEventSink(args.events) if args.events else None
+    try:
+        stats = await run_batch(args.input, args.output, agent.create_team, concurrency=args.concurrency, sink=sink)
+        print_stats(stats)
+        cache_stats = format_completion_cache_stats(agent.model_client)
+        if cache_stats:
+            print(cache_stats)
+    finally:
+        if sink is not None:
+            await sink.close()
+        await agent.model_client.close()
+        await close_http_pool()
+        await close_mcp_pools()
+        close_search_caches()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
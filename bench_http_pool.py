@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+import gemini_compatible_agent
+from http_pool import HttpPool, get_http_pool, close_http_pool
+
+
+async def handle_mcp(request: web.Request) -> web.Response:
+    """Stub Flux MCP endpoint that answers tools/call like the real server"""
+    body = await request.json()
+    arguments = body["params"]["arguments"]
+    image_data = {"imageUrl": f"https://image.example/{abs(hash(arguments['prompt']))}.png"}
+    return web.json_response({
+        "jsonrpc": "2.0",
+        "id": body["id"],
+        "result": {"content": [{"type": "text", "text": json.dumps(image_data)}]},
+    })
+
+
+async def start_stub_server(host: str = "127.0.0.1", port: int = 0):
+    """Start the stub server and return (runner, url)"""
+    app = web.Application()
+    app.router.add_post("/mcp", handle_mcp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/mcp"
+
+
+def _payload(i: int) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": i,
+        "method": "tools/call",
+        "params": {"name": "generateImageUrl", "arguments": {"prompt": f"bench {i}"}},
+    }
+
+
+async def call_unpooled(url: str, i: int):
+    """Old behaviour: one ClientSession (and connection) per call"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=_payload(i)) as response:
+            await response.json()
+
+
+async def call_pooled(pool: HttpPool, url: str, i: int):
+    """New behaviour: reuse the shared keep-alive session"""
+    session = await pool.get_session()
+    async with session.post(url, json=_payload(i)) as response:
+        await response.json()
+
+
+async def measure(name: str, call, requests: int, concurrency: int) -> list[float]:
+    """Run `requests` calls with bounded concurrency and collect latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<28} mean {statistics.mean(latencies):7.2f} ms | "
+        f"p50 {statistics.median(latencies):7.2f} ms | p95 {p95:7.2f} ms | "
+        f"{requests / elapsed:8.1f} req/s"
+    )
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Pooled vs unpooled HTTP latency for generate_image_url")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    runner, url = await start_stub_server()
+    print(f"🧪 Stub Flux server at {url} ({args.requests} requests, concurrency {args.concurrency})\n")
+
+    try:
+        await measure("unpooled (session per call)", lambda i: call_unpooled(url, i), args.requests, args.concurrency)
+
+        async with HttpPool() as pool:
+            await measure("pooled (shared session)", lambda i: call_pooled(pool, url, i), args.requests, args.concurrency)
+
+        # End to end through the real tool function
+        gemini_compatible_agent.IMAGE_URL = url
+        await measure(
+            "generate_image_url (pooled)",
+            lambda i: gemini_compatible_agent.generate_image_url(prompt=f"bench {i}"),
+            args.requests,
+            args.concurrency,
+        )
+        print(f"\nLast JSON-RPC id issued by the shared pool: {get_http_pool().next_request_id() - 1}")
+    finally:
+        await close_http_pool()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from autogen_agentchat.messages import ToolCallExecutionEvent, ToolCallRequestEvent
+
+SEARCH_QUERIES = [
+    "What's the latest news about AI?",
+    "Who won the 2024 Nobel Prize in physics?",
+    "What is the current population of Tokyo?",
+    "Who won IPL 2025 final?",
+]
+IMAGE_QUERIES = [
+    "Create an image of a futuristic city",
+    "Draw a cute robot playing with a cat",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"stub server on port {port} did not start")
+
+
+def start_stub(kind: str, port: int, latency: float, token_delay: float = 0.01) -> subprocess.Popen:
+    """Run a stub server in its own process so it does not skew our CPU and memory numbers"""
+    stub_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_servers.py")
+    process = subprocess.Popen([
+        sys.executable, stub_path, kind,
+        "--port", str(port), "--latency", str(latency), "--token-delay", str(token_delay),
+    ])
+    wait_for_port(port)
+    return process
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def tool_overhead(messages) -> float:
+    """Seconds between each tool call request and its execution result"""
+    requested = {}
+    total = 0.0
+    for message in messages:
+        if isinstance(message, ToolCallRequestEvent):
+            for call in message.content:
+                requested[call.id] = message.created_at
+        elif isinstance(message, ToolCallExecutionEvent):
+            for execution in message.content:
+                if execution.call_id in requested:
+                    total += (message.created_at - requested[execution.call_id]).total_seconds()
+    return total
+
+
+async def run_scenario(name: str, setup, queries: list[str], turns: int, concurrency: int) -> dict:
+    """Measure startup (cold and warm schema cache) and per-turn latency for one agent"""
+    schema_cache = os.environ["MCP_SCHEMA_CACHE"]
+    if os.path.exists(schema_cache):
+        os.remove(schema_cache)
+
+    start = time.perf_counter()
+    create_team = await setup()
+    cold_startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await setup()
+    warm_startup = time.perf_counter() - start
+
+    latencies, overheads, errors = [], [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query: str):
+        nonlocal errors
+        async with semaphore:
+            team = create_team()
+            start = time.perf_counter()
+            try:
+                result = await team.run(task=query)
+            except Exception as e:
+                errors += 1
+                print(f"❌ {name}: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+            overheads.append(tool_overhead(result.messages))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(queries[i % len(queries)]) for i in range(turns)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "scenario": name,
+        "cold_startup_ms": cold_startup * 1000,
+        "warm_startup_ms": warm_startup * 1000,
+        "turns": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "tool_overhead_ms": (sum(overheads) / len(overheads) * 1000) if overheads else 0.0,
+        "turns_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+async def run_script_scenario(name: str, command: list[str], turns: int, concurrency: int) -> dict:
+    """Measure an entry point that runs one fixed query per process (main.py, simple_autogen_mcp.py).
+
+    Each turn is a fresh process, so its latency includes interpreter and agent startup;
+    the first two runs are reported as cold and warm startup.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=directory, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            _, stderr = await process.communicate()
+            elapsed = time.perf_counter() - start
+            if process.returncode != 0:
+                errors += 1
+                print(f"❌ {name}: exit code {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
+                return elapsed
+            latencies.append(elapsed)
+            return elapsed
+
+    cold_startup = await one()
+    warm_startup = await one()
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(max(0, turns - 2))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "scenario": name,
+        "cold_startup_ms": cold_startup * 1000,
+        "warm_startup_ms": warm_startup * 1000,
+        "turns": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "tool_overhead_ms": 0.0,  # Not observable from outside the process
+        "turns_per_s": (len(latencies) - 2) / elapsed if elapsed > 0 and len(latencies) > 2 else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+async def run_benchmarks(args, mcp_url: str) -> list[dict]:
+    # Imported here so the environment set in main() is seen by their module constants
+    import autogen_mcp_agent
+    import gemini_compatible_agent
+    import multi_tool_agent
+    from http_pool import close_http_pool
+    from mcp_pool import close_mcp_pools
+    from model_client import close_model_client, get_model_client
+    from search_cache import close_search_caches
+
+    autogen_mcp_agent.MCP_URL = mcp_url
+    multi_tool_agent.SEARCH_URL = multi_tool_agent.IMAGE_URL = mcp_url
+    gemini_compatible_agent.SEARCH_URL = gemini_compatible_agent.IMAGE_URL = mcp_url
+
+    async def setup_search():
+        agent = autogen_mcp_agent.AutoGenMCPAgent()
+        if not await agent.initialize():
+            raise RuntimeError("search agent failed to initialize")
+        return agent.create_team
+
+    async def setup_multi():
+        tools = await multi_tool_agent.setup_mcp_tools()
+        model_client = get_model_client()
+        return lambda: multi_tool_agent.create_team(model_client, tools)
+
+    async def setup_gemini():
+        tools = await gemini_compatible_agent.setup_tools()
+        model_client = get_model_client()
+        return lambda: gemini_compatible_agent.create_team(model_client, tools)
+
+    scenarios = {
+        "search": (setup_search, SEARCH_QUERIES),
+        "multi": (setup_multi, SEARCH_QUERIES + IMAGE_QUERIES),
+        "gemini": (setup_gemini, SEARCH_QUERIES + IMAGE_QUERIES),
+    }
+
+    # Script entry points run one fixed query per process; the MCP URL of simple_autogen_mcp.py is patched in
+    scripts = {
+        "main": [sys.executable, "main.py"],
+        "simple": [
+            sys.executable, "-c",
+            "import asyncio, sys, simple_autogen_mcp as m; m.url = sys.argv[1]; asyncio.run(m.main())",
+            mcp_url,
+        ],
+    }
+
+    results = []
+    try:
+        for name in args.scenarios:
+            if name in scripts:
+                results.append(await run_script_scenario(name, scripts[name], args.turns, args.concurrency))
+                continue
+            setup, queries = scenarios[name]
+            results.append(await run_scenario(name, setup, queries, args.turns, args.concurrency))
+    finally:
+        await close_model_client()
+        await close_http_pool()
+        await close_mcp_pools()
+        close_search_caches()
+    return results
+
+
+def print_results(results: list[dict]):
+    print("\n" + "=" * 110)
+    print(
+        f"{'scenario':<10}{'cold start':>12}{'warm start':>12}{'turns':>7}{'p50':>10}{'p95':>10}{'p99':>10}"
+        f"{'tool ovh':>11}{'turns/s':>10}{'peak RSS':>11}"
+    )
+    for r in results:
+        print(
+            f"{r['scenario']:<10}{r['cold_startup_ms']:>10.1f}ms{r['warm_startup_ms']:>10.1f}ms{r['turns']:>7}"
+            f"{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms{r['p99_ms']:>8.1f}ms{r['tool_overhead_ms']:>9.1f}ms"
+            f"{r['turns_per_s']:>10.2f}{r['peak_rss_mb']:>9.1f}MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agents against local stub servers")
+    scenario_names = ["search", "multi", "gemini", "main", "simple"]
+    parser.add_argument("--scenarios", nargs="+", choices=scenario_names, default=scenario_names)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model-latency", type=float, default=0.2, help="Stub model latency in seconds")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="Stub MCP tool latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Stub model delay between streamed chunks")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    mcp_port, model_port = free_port(), free_port()
+    workdir = tempfile.mkdtemp(prefix="bench_offline_")
+
+    # Point the agents at the stubs and switch off caches so every turn does real work
+    os.environ.update({
+        "MODEL_BASE_URL": f"http://127.0.0.1:{model_port}/v1",
+        "GEMINI_API_KEY": "stub",
+        "MODEL_RPM": "0",
+        "MODEL_TPM": "0",
+        "MODEL_INITIAL_CONCURRENCY": str(args.concurrency),
+        "MCP_SCHEMA_CACHE": os.path.join(workdir, "tool_schemas.json"),
+        "MCP_SCHEMA_REVALIDATE": "false",
+        "SEARCH_CACHE_ENABLED": "false",
+        "IMAGE_CACHE_MODE": "off",
+    })
+
+    stubs = [
+        start_stub("mcp", mcp_port, args.tool_latency),
+        start_stub("model", model_port, args.model_latency, args.token_delay),
+    ]
+    try:
+        mcp_url = f"http://127.0.0.1:{mcp_port}/mcp?api_key=stub"
+        results = asyncio.run(run_benchmarks(args, mcp_url))
+    finally:
+        for stub in stubs:
+            stub.terminate()
+            stub.wait()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from autogen_ext.tools.mcp import StreamableHttpServerParams
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from schema_cache import fetch_tools
+from tool_wrappers import DelegatingTool
+
+load_dotenv()
+
+# Circuit breaker configuration
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))  # Consecutive failures that open the circuit
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "15"))  # Seconds open before the first probe
+BREAKER_MAX_RESET = float(os.getenv("BREAKER_MAX_RESET", "120"))  # Longest wait between probes
+BREAKER_PROBE_TIMEOUT = float(os.getenv("BREAKER_PROBE_TIMEOUT", "10"))  # Seconds a probe may take
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Keep references to probe tasks so they are not garbage collected
+_probe_tasks: set[asyncio.Task] = set()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a tool whose circuit is open"""
+
+
+def describe_error(error: BaseException) -> str:
+    """Short description of an error, looking inside the exception groups raised by MCP sessions"""
+    while getattr(error, "exceptions", None):
+        error = error.exceptions[0]
+    return str(error) or type(error).__name__
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for one tool.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast. With a `probe`, the tool is checked in the background after
+    `reset_timeout` (half-open while the probe runs, doubling the wait up to
+    `max_reset_timeout` after each failed probe) and the circuit closes when a
+    probe succeeds. Without one, the first call after `reset_timeout` is let
+    through as the trial.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        probe: Optional[Callable[[], Awaitable[Any]]] = None,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_timeout: float = BREAKER_RESET,
+        max_reset_timeout: float = BREAKER_MAX_RESET,
+        probe_timeout: float = BREAKER_PROBE_TIMEOUT,
+    ):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self._wait = reset_timeout
+        self._trial_running = False
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        """Whether the tool should be offered to the model: closed, or due for its trial call"""
+        if self.state == CLOSED:
+            return True
+        return self.probe is None and self.state == OPEN and time.monotonic() - self.opened_at >= self._wait
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; without a probe this admits one trial call once the wait is over"""
+        if self.state == CLOSED:
+            return True
+        if self.probe is None and not self._trial_running and time.monotonic() - self.opened_at >= self._wait:
+            self._set_state(HALF_OPEN)
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_running = False
+        self._wait = self.reset_timeout
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self, error: BaseException):
+        self.failures += 1
+        self.last_error = describe_error(error)
+        if self.state == HALF_OPEN:
+            self._trial_running = False
+            self._wait = min(self._wait * 2, self.max_reset_timeout)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def trip(self, reason: str):
+        """Open the circuit now, e.g. for a tool whose server was down at startup"""
+        self.last_error = reason
+        if self.state != OPEN:
+            self._open()
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+        if self.probe is not None and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.create_task(self._probe_until_closed())
+            _probe_tasks.add(self._probe_task)
+            self._probe_task.add_done_callback(_probe_tasks.discard)
+
+    async def _probe_until_closed(self):
+        while True:
+            await asyncio.sleep(self._wait)
+            if self.state == CLOSED:
+                return  # A call that was already in flight succeeded meanwhile
+            self._set_state(HALF_OPEN)
+            try:
+                await asyncio.wait_for(self.probe(), timeout=self.probe_timeout)
+            except Exception as e:
+                self.last_error = describe_error(e)
+                self._wait = min(self._wait * 2, self.max_reset_timeout)
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+            else:
+                self.record_success()
+                return
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        if state == OPEN:
+            print(f"🔌 {self.name} unavailable, failing fast (next check in {self._wait:.0f}s): {self.last_error}")
+        elif state == CLOSED:
+            print(f"✅ {self.name} recovered")
+
+
+class BreakerTool(DelegatingTool):
+    """Tool wrapper that fails fast with CircuitOpenError while the tool's circuit is open.
+
+    Argument errors and cancellations say nothing about the tool's health and
+    are not counted as failures.
+    """
+
+    def __init__(self, inner: BaseTool, breaker: CircuitBreaker):
+        super().__init__(inner)
+        self.breaker = breaker
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"The {self.name} tool is temporarily unavailable ({self.breaker.last_error}); "
+                "tell the user and answer without it"
+            )
+        try:
+            value = await self._inner.run(args, cancellation_token)
+        except (ValueError, TypeError):
+            raise
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+        return value
+
+
+def mcp_probe(server_params: StreamableHttpServerParams) -> Callable[[], Awaitable[Any]]:
+    """Probe that checks an MCP server with initialize + list_tools (refreshing the schema cache)"""
+    return lambda: fetch_tools(server_params)
+
+
+def with_breaker(tool: BaseTool, probe: Optional[Callable[[], Awaitable[Any]]] = None) -> BaseTool:
+    """Wrap a tool with a circuit breaker if enabled"""
+    return BreakerTool(tool, CircuitBreaker(tool.name, probe)) if BREAKER_ENABLED else tool
+
+
+def find_breaker(tool: BaseTool) -> Optional[CircuitBreaker]:
+    """The circuit breaker somewhere in a stack of wrappers, if any"""
+    while tool is not None:
+        if isinstance(tool, BreakerTool):
+            return tool.breaker
+        tool = getattr(tool, "inner", None)
+    return None
+
+
+def healthy_tools(tools: Iterable[BaseTool]) -> list[BaseTool]:
+    """The tools whose circuit is closed (tools without a breaker always count as healthy)"""
+    return [tool for tool in tools if (breaker := find_breaker(tool)) is None or breaker.available]
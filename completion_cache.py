@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncGenerator, Literal, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from autogen_core.tools import Tool, ToolSchema
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from sqlite_store import connect_sqlite
+
+load_dotenv()
+
+# Completion cache configuration
+COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+COMPLETION_CACHE_DB = os.path.expanduser(os.getenv("COMPLETION_CACHE_DB", "~/.cache/autogen_mcp/completions.sqlite"))
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Also cache sampled (temperature > 0 or unset) completions, e.g. for regression runs that want fixed answers
+COMPLETION_CACHE_FORCE = os.getenv("COMPLETION_CACHE_FORCE", "false").lower() in ("1", "true", "yes")
+
+# Client arguments that change what the model answers
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "top_k", "max_tokens", "seed", "stop", "n",
+    "frequency_penalty", "presence_penalty", "response_format", "reasoning_effort",
+)
+
+_STREAM_PIECE = re.compile(r"\s*\S+")
+
+
+def request_key(
+    model: str,
+    messages: Sequence[LLMMessage],
+    tools: Sequence[Tool | ToolSchema],
+    tool_choice: Tool | str,
+    json_output: Optional[bool | type[BaseModel]],
+    sampling: Mapping[str, Any],
+) -> str:
+    """SHA-256 of the canonical JSON of everything that determines a completion"""
+    if isinstance(json_output, type):
+        json_output = json_output.model_json_schema()
+    request = {
+        "model": model,
+        "messages": [message.model_dump(mode="json") for message in messages],
+        "tools": [tool.schema if isinstance(tool, Tool) else tool for tool in tools],
+        "tool_choice": tool_choice.name if isinstance(tool_choice, Tool) else tool_choice,
+        "json_output": json_output,
+        "sampling": dict(sampling),
+    }
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionStore:
+    """SQLite store of completions, shared between processes, that evicts the least recently used
+    entries once their total size exceeds `max_bytes`.
+
+    One connection is kept open (used by one worker thread at a time) until `close()`.
+    """
+
+    def __init__(self, db_path: str = COMPLETION_CACHE_DB, max_bytes: int = COMPLETION_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """The store's connection, opened on first use; callers hold `_lock`"""
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE completions SET used_at = ? WHERE key = ?", (time.time(), key))
+        return row[0] if row else None
+
+    def _put(self, key: str, value: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for old_key, size in conn.execute("SELECT key, size FROM completions ORDER BY used_at").fetchall():
+                if total <= self.max_bytes or old_key == key:
+                    break
+                conn.execute("DELETE FROM completions WHERE key = ?", (old_key,))
+                total -= size
+                self.evictions += 1
+
+    async def get(self, key: str) -> Optional[CreateResult]:
+        value = await asyncio.to_thread(self._get, key)
+        return CreateResult.model_validate_json(value) if value is not None else None
+
+    async def put(self, key: str, result: CreateResult):
+        await asyncio.to_thread(self._put, key, result.model_dump_json())
+
+
+class CachingChatCompletionClient(ChatCompletionClient):
+    """Model client wrapper that answers repeated requests from a persistent completion cache.
+
+    Requests are keyed on a canonical hash of the model, messages, tool
+    schemas and sampling parameters (the client's `sampling` defaults
+    overridden by per-call `extra_create_args`). Only deterministic requests
+    are cached, i.e. with temperature set to 0, unless `force` is given.
+    Cached streams are replayed as chunks followed by the final result, so
+    streaming agents behave as on a live call. Hits never reach the wrapped
+    client, and so do not count against its rate limits.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        model: str,
+        sampling: Optional[Mapping[str, Any]] = None,
+        store: Optional[CompletionStore] = None,
+        force: bool = COMPLETION_CACHE_FORCE,
+    ):
+        self._client = client
+        self.model = model
+        self.sampling = dict(sampling or {})
+        self.store = store or CompletionStore()
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _cache_key(self, messages, tools, tool_choice, json_output, extra_create_args) -> Optional[str]:
+        """The request's cache key, or None if its answer is sampled and must not be cached"""
+        sampling = {**self.sampling, **{k: v for k, v in extra_create_args.items() if k in SAMPLING_PARAMS}}
+        temperature = sampling.get("temperature")
+        if not self.force and (temperature is None or temperature > 0):
+            self.bypassed += 1
+            return None
+        return request_key(self.model, messages, tools, tool_choice, json_output, sampling)
+
+    async def _lookup(self, key: Optional[str]) -> Optional[CreateResult]:
+        if key is None:
+            return None
+        result = await self.store.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result.model_copy(update={"cached": True})
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        key = self._cache_key(messages, tools, tool_choice, json_output, extra_create_args)
+        cached = await self._lookup(key)
+        if cached is not None:
+            return cached
+        result = await self._client.create(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        if key is not None:
+            await self.store.put(key, result)
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        key = self._cache_key(messages, tools, tool_choice, json_output, extra_create_args)
+        cached = await self._lookup(key)
+        if cached is not None:
+            # Replay the text word by word, then the final result, like a live stream
+            if isinstance(cached.content, str):
+                for piece in _STREAM_PIECE.findall(cached.content):
+                    yield piece
+            yield cached
+            return
+        async for chunk in self._client.create_stream(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        ):
+            if isinstance(chunk, CreateResult) and key is not None:
+                await self.store.put(key, chunk)
+            yield chunk
+
+    async def close(self) -> None:
+        self.store.close()
+        await self._client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self):  # type: ignore
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+    def cache_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.store.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def stats(self) -> dict:
+        inner = self._client.stats() if hasattr(self._client, "stats") else {}
+        return {**inner, "completion_cache": self.cache_stats()}
+
+
+def format_completion_cache_stats(client: ChatCompletionClient) -> Optional[str]:
+    """One-line summary of the completion cache counters, if the client has a cache that saw requests"""
+    if not isinstance(client, CachingChatCompletionClient) or not (client.hits or client.misses or client.bypassed):
+        return None
+    stats = client.cache_stats()
+    line = f"🧠 Completion cache: {stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.0%}"
+    if stats["bypassed"]:
+        line += f", {stats['bypassed']} sampled requests not cached (set MODEL_TEMPERATURE=0 or COMPLETION_CACHE_FORCE)"
+    return line
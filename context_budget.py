@@ -0,0 +1,219 @@
+import asyncio
+import os
+from typing import Any, List, Mapping, Optional
+
+import tiktoken
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import (
+    AssistantMessage,
+    ChatCompletionClient,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+from dotenv import load_dotenv
+from opentelemetry import trace
+
+load_dotenv()
+
+# Context window configuration
+CONTEXT_POLICY = os.getenv("CONTEXT_POLICY", "tokens").lower()  # unbounded, window (last N turns) or tokens
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "8"))  # Turns kept by the window policy
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))  # History tokens kept by the tokens policy
+CONTEXT_SUMMARIZE = os.getenv("CONTEXT_SUMMARIZE", "false").lower() in ("1", "true", "yes")
+CONTEXT_REPORT = os.getenv("CONTEXT_REPORT", "false").lower() in ("1", "true", "yes")  # Print prompt size per turn
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators the API adds around each message
+SUMMARY_SOURCE = "context_summary"
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant that uses tools. "
+    "Merge the new part of the conversation into the summary so far. Keep the facts, names, numbers, "
+    "links and open questions the assistant may need later; drop pleasantries and raw tool output. "
+    "Answer with the updated summary only, in at most 150 words."
+)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in a text with tiktoken, or ~4 characters per token if its encoding cannot be loaded"""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False  # No encoding files offline; don't try to download them again
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """Cut a text to at most `limit` tokens (counted like count_tokens), marking the cut with an ellipsis"""
+    if count_tokens(text) <= limit:
+        return text
+    if _encoding:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:limit]).rstrip() + "…"
+    return text[: limit * 4].rstrip() + "…"
+
+
+def message_tokens(message: LLMMessage) -> int:
+    return count_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS
+
+
+def transcript_line(message: LLMMessage, limit: int = 600) -> str:
+    """One line of a plain-text transcript, with long tool output cut to `limit` characters"""
+    if isinstance(message, UserMessage):
+        return f"{message.source}: {str(message.content)[:limit]}"
+    if isinstance(message, AssistantMessage):
+        if isinstance(message.content, str):
+            return f"assistant: {message.content[:limit]}"
+        calls = ", ".join(f"{call.name}({call.arguments})" for call in message.content)
+        return f"assistant called {calls[:limit]}"
+    if isinstance(message, FunctionExecutionResultMessage):
+        return "\n".join(f"{result.name} returned: {result.content[:limit]}" for result in message.content)
+    return f"{type(message).__name__}: {str(message.content)[:limit]}"
+
+
+class BudgetedChatCompletionContext(ChatCompletionContext):
+    """Model context that keeps a long-running conversation within a turn and token budget.
+
+    The history is split into turns, each starting at a user message, so a
+    tool call is never separated from its result. Before every model call the
+    oldest turns are dropped until at most `max_turns` remain and they fit in
+    `token_budget` tokens; the current turn is always kept. Dropped turns are
+    freed, so memory stays flat too. With `summarize`, they are folded into a
+    running summary by a background model call and the summary is sent ahead
+    of the kept turns from then on.
+    """
+
+    def __init__(
+        self,
+        model_client: Optional[ChatCompletionClient] = None,
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        summarize: bool = CONTEXT_SUMMARIZE,
+        report: bool = CONTEXT_REPORT,
+        initial_messages: List[LLMMessage] | None = None,
+    ):
+        super().__init__(initial_messages)
+        self.model_client = model_client
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarize = summarize and model_client is not None
+        self.report = report
+        self.summary: Optional[str] = None
+        self.dropped_turns = 0
+        self.last_prompt_tokens = 0
+        self._tokens = [message_tokens(message) for message in self._messages]
+        self._to_summarize: list[LLMMessage] = []
+        self._summarizing: Optional[asyncio.Task] = None
+
+    async def add_message(self, message: LLMMessage) -> None:
+        await super().add_message(message)
+        self._tokens.append(message_tokens(message))
+
+    async def clear(self) -> None:
+        await super().clear()
+        self._tokens = []
+        self.summary = None
+
+    def _turn_starts(self) -> list[int]:
+        """Index of the first message of each turn (consecutive user messages form one turn)"""
+        return [
+            index
+            for index, message in enumerate(self._messages)
+            if index == 0 or (isinstance(message, UserMessage) and not isinstance(self._messages[index - 1], UserMessage))
+        ]
+
+    def _summary_message(self) -> Optional[UserMessage]:
+        if not self.summary:
+            return None
+        return UserMessage(content=f"Summary of the earlier conversation:\n{self.summary}", source=SUMMARY_SOURCE)
+
+    def _trim(self):
+        """Drop the oldest turns that exceed the budget"""
+        starts = self._turn_starts()
+        summary = self._summary_message()
+        budget = self.token_budget - (message_tokens(summary) if summary else 0) if self.token_budget else None
+        kept_tokens = sum(self._tokens)
+        drop = 0
+        # Never drop the last turn: it holds the question being answered
+        while drop < len(starts) - 1:
+            over_turns = self.max_turns is not None and len(starts) - drop > self.max_turns
+            over_tokens = budget is not None and kept_tokens > budget
+            if not (over_turns or over_tokens):
+                break
+            kept_tokens -= sum(self._tokens[starts[drop]:starts[drop + 1]])
+            drop += 1
+        if not drop:
+            return
+        cut = starts[drop]
+        dropped = self._messages[:cut]
+        self._messages = self._messages[cut:]
+        self._tokens = self._tokens[cut:]
+        self.dropped_turns += drop
+        if self.summarize:
+            self._to_summarize.extend(dropped)
+            if self._summarizing is None or self._summarizing.done():
+                self._summarizing = asyncio.create_task(self._summarize())
+
+    async def _summarize(self):
+        """Fold dropped turns into the running summary, one model call per batch"""
+        while self._to_summarize:
+            dropped, self._to_summarize = self._to_summarize, []
+            transcript = "\n".join(transcript_line(message) for message in dropped)
+            previous = f"Summary so far:\n{self.summary}\n\n" if self.summary else ""
+            try:
+                result = await self.model_client.create([
+                    SystemMessage(content=SUMMARY_PROMPT),
+                    UserMessage(content=f"{previous}New part of the conversation:\n{transcript}", source="user"),
+                ])
+            except Exception as e:
+                print(f"⚠️ Could not summarize {len(dropped)} earlier messages: {e}")
+                continue
+            if isinstance(result.content, str) and result.content.strip():
+                self.summary = result.content.strip()
+
+    async def get_messages(self) -> List[LLMMessage]:
+        self._trim()
+        summary = self._summary_message()
+        messages = ([summary] if summary else []) + list(self._messages)
+        self.last_prompt_tokens = sum(self._tokens) + (message_tokens(summary) if summary else 0)
+        trace.get_current_span().set_attributes({
+            "context.tokens": self.last_prompt_tokens,
+            "context.messages": len(messages),
+            "context.dropped_turns": self.dropped_turns,
+        })
+        # Report once per turn: on the model call that answers a new user message
+        if self.report and self._messages and isinstance(self._messages[-1], UserMessage):
+            details = f", {self.dropped_turns} earlier turns dropped" if self.dropped_turns else ""
+            if summary:
+                details += " (summarized)"
+            print(f"📏 Context: {self.last_prompt_tokens} tokens in {len(messages)} messages{details}")
+        return messages
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state = dict(await super().save_state())
+        state["summary"] = self.summary
+        state["dropped_turns"] = self.dropped_turns
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await super().load_state(state)
+        self._tokens = [message_tokens(message) for message in self._messages]
+        self.summary = state.get("summary")
+        self.dropped_turns = state.get("dropped_turns", 0)
+
+
+def create_model_context(model_client: Optional[ChatCompletionClient] = None) -> Optional[ChatCompletionContext]:
+    """Model context for one agent following CONTEXT_POLICY; None keeps autogen's unbounded history.
+
+    `model_client` is only needed to summarize dropped turns.
+    """
+    if CONTEXT_POLICY == "window":
+        return BudgetedChatCompletionContext(model_client, max_turns=CONTEXT_MAX_TURNS)
+    if CONTEXT_POLICY == "tokens":
+        return BudgetedChatCompletionContext(model_client, token_budget=CONTEXT_TOKEN_BUDGET)
+    return None
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional, Sequence, TypeVar
+
+from autogen_agentchat.base import TaskResult, Team
+from autogen_agentchat.messages import BaseChatMessage, ModelClientStreamingChunkEvent
+from autogen_core import CancellationToken
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_DEADLINE = float(os.getenv("QUERY_DEADLINE", "120"))  # Seconds a query may run; 0 disables
+
+T = TypeVar("T")
+
+
+class _CancelledRunFilter(logging.Filter):
+    """Drop the runtime's error log for handlers stopped by a cancelled query: that is not an error"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not (record.exc_info and isinstance(record.exc_info[1], asyncio.CancelledError))
+
+
+logging.getLogger("autogen_core").addFilter(_CancelledRunFilter())
+
+
+class QueryCancellation:
+    """Cancellation token for one query, cancelled by the user or when its deadline passes"""
+
+    def __init__(self, deadline: float = QUERY_DEADLINE):
+        self.token = CancellationToken()
+        self.deadline = deadline
+        self.expired = False
+        self.started = time.monotonic()
+        self._timer = asyncio.get_running_loop().call_later(deadline, self._expire) if deadline > 0 else None
+
+    def _expire(self):
+        self.expired = True
+        self.token.cancel()
+
+    def cancel(self):
+        self.token.cancel()
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.is_cancelled()
+
+
+class PartialAnswer:
+    """Track the best answer seen so far in a run_stream"""
+
+    def __init__(self):
+        self.message = ""
+        self.chunks: list[str] = []
+
+    async def watch(self, stream: AsyncIterator) -> AsyncIterator:
+        async for event in stream:
+            if isinstance(event, ModelClientStreamingChunkEvent):
+                self.chunks.append(event.content)
+            elif isinstance(event, BaseChatMessage):
+                self.chunks.clear()
+                if event.source != "user":
+                    self.message = event.to_text()
+            yield event
+
+    @property
+    def text(self) -> str:
+        """Text still being streamed if there is any, else the last complete answer"""
+        return "".join(self.chunks) or self.message
+
+
+@dataclass
+class QueryOutcome:
+    result: Optional[TaskResult]
+    partial: str
+    cancelled: bool = False
+    expired: bool = False
+    team: Optional[Team] = None  # Replacement for a team whose run was cancelled
+
+
+# Stream steps abandoned after a cancel, kept referenced until they wind down
+_abandoned: set[asyncio.Future] = set()
+
+
+def _abandon(step: asyncio.Future):
+    _abandoned.add(step)
+    step.add_done_callback(_abandoned.discard)
+    step.add_done_callback(lambda f: f.cancelled() or f.exception())  # Nobody awaits it: mark errors retrieved
+
+
+async def until_cancelled(stream: AsyncIterator[T], cancellation: QueryCancellation) -> AsyncGenerator[T, None]:
+    """Pass `stream` through, raising CancelledError as soon as the query is cancelled.
+
+    A cancelled run_stream still waits for the tool calls in progress before
+    it stops; this stops waiting at once and leaves the run to wind down in
+    the background.
+    """
+    stopped = asyncio.get_running_loop().create_future()
+    cancellation.token.add_callback(lambda: stopped.done() or stopped.set_result(None))
+    iterator = stream.__aiter__()
+    while True:
+        step = asyncio.ensure_future(iterator.__anext__())
+        try:
+            await asyncio.wait((step, stopped), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            step.cancel()
+            raise
+        if not step.done():
+            _abandon(step)
+            raise asyncio.CancelledError()
+        try:
+            item = step.result()
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+def release_team(team: Team):
+    """Stop what is left of a cancelled team's run so it can be garbage collected.
+
+    An agent whose tool call was cancelled can wait forever for the tool's
+    result, which keeps the team's runtime alive; the team is being replaced,
+    so its remaining message handlers are cancelled.
+    """
+    for task in list(getattr(getattr(team, "_runtime", None), "_background_tasks", ())):
+        task.cancel()
+
+
+async def run_with_deadline(
+    team: Team,
+    task: str | Sequence[BaseChatMessage],
+    render: Optional[Callable[[AsyncIterator], Awaitable]] = None,
+    cancellation: Optional[QueryCancellation] = None,
+    create_team: Optional[Callable[[], Team]] = None,
+) -> QueryOutcome:
+    """Run one query under a cancellation token and deadline, keeping the best partial answer.
+
+    The run stops as soon as the token is cancelled. A cancelled team cannot
+    be reused and is released; when `create_team` is given the outcome carries
+    a new team restored to the conversation as it was before this query.
+    """
+    cancellation = cancellation or QueryCancellation()
+    partial = PartialAnswer()
+    state = await team.save_state() if create_team is not None else None
+    try:
+        run = team.run_stream(task=task, cancellation_token=cancellation.token)
+        stream = partial.watch(until_cancelled(run, cancellation))
+        if render is not None:
+            result = await render(stream)
+        else:
+            result = None
+            async for event in stream:
+                if isinstance(event, TaskResult):
+                    result = event
+        return QueryOutcome(result if isinstance(result, TaskResult) else None, partial.text)
+    except asyncio.CancelledError:
+        # Only swallow our own cancellation, not that of the surrounding task
+        current = asyncio.current_task()
+        if not cancellation.cancelled or (current is not None and current.cancelling()):
+            raise
+        # The cancelled team cannot run again; free its runtime whether or not it is replaced
+        release_team(team)
+        replacement = None
+        if create_team is not None:
+            replacement = create_team()
+            await replacement.load_state(state)
+        return QueryOutcome(None, partial.text, cancelled=True, expired=cancellation.expired, team=replacement)
+    finally:
+        cancellation.close()
+
+
+def report_outcome(outcome: QueryOutcome, cancellation: QueryCancellation):
+    """Print why a query stopped early and the best answer it had so far"""
+    if not outcome.cancelled:
+        return
+    elapsed = time.monotonic() - cancellation.started
+    reason = f"⏰ Deadline of {cancellation.deadline:.0f}s reached" if outcome.expired else "🛑 Cancelled"
+    print(f"\n{reason} after {elapsed:.1f}s")
+    if outcome.partial:
+        print(f"📝 Best partial answer:\n{outcome.partial}")
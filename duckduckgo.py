@@ -1,7 +1,10 @@
+import asyncio
+
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 from dotenv import load_dotenv
 import os
+from schema_cache import invalidate, is_stale_schema_error, load_cached_tools, store_tools
 
 load_dotenv()
 
@@ -20,14 +23,20 @@ async def main():
             # Initialize the connection
             await session.initialize()
 
-            # List available tools
-            tools_result = await session.list_tools()
-            print(tools_result)
-            print(f"Available tools: {', '.join([t.name for t in tools_result.tools])}")
+            # List available tools, skipping the round trip when they are cached
+            tools = await asyncio.to_thread(load_cached_tools, url)
+            if not tools:
+                tools_result = await session.list_tools()
+                print(tools_result)
+                await asyncio.to_thread(store_tools, url, tools_result.tools)
+                tools = {t.name: t for t in tools_result.tools}
+            print(f"Available tools: {', '.join(tools)}")
             result = await session.call_tool(name="search", arguments={"query": "WHO WON IPL 2025 FINAL"})
+            error_text = "\n".join(getattr(item, "text", "") for item in result.content)
+            if result.isError and is_stale_schema_error(Exception(error_text)):
+                # The server no longer knows the cached schema; rediscover on the next run
+                await asyncio.to_thread(invalidate, url, "search")
             print(result)
 
 if __name__ == "__main__":
-    import asyncio
-
     asyncio.run(main())
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import AsyncIterator, Callable, Optional
+
+from autogen_agentchat.base import Response, TaskResult
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, ModelClientStreamingChunkEvent
+from autogen_agentchat.ui import Console
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Event sink configuration
+EVENT_SINK = os.getenv("EVENT_SINK", "console").lower()  # "console" or "jsonl"
+EVENT_SINK_PATH = os.path.expanduser(os.getenv("EVENT_SINK_PATH", "~/.cache/autogen_mcp/events.jsonl"))
+EVENT_SINK_QUEUE = int(os.getenv("EVENT_SINK_QUEUE", "10000"))  # Events buffered before producers wait
+EVENT_SINK_BATCH = int(os.getenv("EVENT_SINK_BATCH", "512"))  # Most events per write
+EVENT_SINK_SAMPLE = float(os.getenv("EVENT_SINK_SAMPLE", "1.0"))  # Fraction of runs whose events are recorded
+EVENT_SINK_CHUNKS = os.getenv("EVENT_SINK_CHUNKS", "false").lower() == "true"  # Record token chunks too
+EVENT_SINK_DROP = os.getenv("EVENT_SINK_DROP", "false").lower() == "true"  # Drop events instead of waiting when full
+
+
+def serialize_event(event) -> dict:
+    """Compact JSON form of a run_stream item"""
+    if isinstance(event, TaskResult):
+        return {"type": "TaskResult", "stop_reason": event.stop_reason}
+    if isinstance(event, (BaseChatMessage, BaseAgentEvent)):
+        return {"type": event.__class__.__name__, "source": event.source, "content": event.to_text()}
+    return {"type": type(event).__name__, "content": str(event)}
+
+
+class JsonlEventSink:
+    """Drop-in replacement for Console that writes compact JSONL events.
+
+    `await sink(stream)` consumes a run_stream and returns its TaskResult,
+    like Console. Events go through a bounded queue to a background writer
+    that serializes and appends them off the event loop, batching whatever
+    accumulated while the previous write was in progress. When the queue is
+    full producers wait (back-pressure) or, with `drop=True`, the event is
+    counted and dropped. With `sample_rate` below 1 only that fraction of runs
+    is recorded; the final TaskResult of every run is always kept.
+    """
+
+    def __init__(
+        self,
+        path: str = EVENT_SINK_PATH,
+        max_queue: int = EVENT_SINK_QUEUE,
+        batch_size: int = EVENT_SINK_BATCH,
+        sample_rate: float = EVENT_SINK_SAMPLE,
+        include_chunks: bool = EVENT_SINK_CHUNKS,
+        drop: bool = EVENT_SINK_DROP,
+    ):
+        self.path = path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.sample_rate = sample_rate
+        self.include_chunks = include_chunks
+        self.drop = drop
+        self.written = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _start(self):
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def emit(self, record: dict):
+        """Queue one record, waiting for space unless the sink drops on overflow"""
+        self._start()
+        if not self.drop:
+            await self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def __call__(self, stream: AsyncIterator, *, run_id: Optional[str] = None) -> Optional[TaskResult | Response]:
+        run_id = run_id or uuid.uuid4().hex[:12]
+        sampled = random.random() < self.sample_rate
+        last = None
+        async for event in stream:
+            if isinstance(event, (TaskResult, Response)):
+                last = event
+            elif not sampled or (isinstance(event, ModelClientStreamingChunkEvent) and not self.include_chunks):
+                continue
+            record = serialize_event(event)
+            record["run"] = run_id
+            record["ts"] = round(time.time(), 3)
+            usage = getattr(event, "models_usage", None)
+            if usage is not None:
+                record["usage"] = {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens}
+            await self.emit(record)
+        return last
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stop = None in batch
+            records = [record for record in batch if record is not None]
+            if records:
+                try:
+                    await asyncio.to_thread(self._append, records)
+                    self.written += len(records)
+                except OSError as e:
+                    self.dropped += len(records)
+                    print(f"⚠️ Event sink write failed: {e}")
+            if stop:
+                return
+
+    def _append(self, records: list[dict]):
+        data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    async def close(self):
+        """Flush queued events and stop the writer"""
+        if self._writer is not None and not self._writer.done():
+            await self._queue.put(None)
+            await self._writer
+        self._writer = None
+
+    def stats(self) -> dict:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize() if self._queue else 0}
+
+
+_sink: Optional[JsonlEventSink] = None
+
+
+def get_event_sink() -> Callable:
+    """Return the configured sink: Console for interactive use, or the process-wide JSONL sink"""
+    global _sink
+    if EVENT_SINK != "jsonl":
+        return Console
+    if _sink is None:
+        _sink = JsonlEventSink()
+    return _sink
+
+
+async def close_event_sink():
+    """Flush and close the process-wide JSONL sink, if it was created"""
+    global _sink
+    if _sink is not None:
+        sink, _sink = _sink, None
+        await sink.close()
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from autogen_agentchat.messages import BaseChatMessage, TextMessage
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+
+from deadline import QueryCancellation
+from tracing import tracer
+
+load_dotenv()
+
+# Fast-path router configuration
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "false").lower() in ("1", "true", "yes")
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_PATH_THRESHOLD", "0.8"))  # Minimum confidence to skip planning
+# Intents whose tool output is shown as is, without a model call (e.g. "image"); these turns
+# are not added to the conversation the model sees
+FAST_PATH_VERBATIM = {i.strip() for i in os.getenv("FAST_PATH_VERBATIM", "").split(",") if i.strip()}
+
+_IMAGE_NOUNS = r"(?:image|picture|photo|illustration|drawing|painting|artwork|poster|logo|sketch|wallpaper)s?"
+_POLITE = r"^\s*(?:(?:please|can you|could you|would you)\s+)*"
+# An image noun as the direct object, followed by what it shows: "generate a watercolor painting of a fox"
+_IMAGE_REQUEST = re.compile(
+    _POLITE + r"(?P<verb>create|generate|draw|make|paint|render|design|produce|sketch)\s+(?:me\s+)?"
+    rf"(?:an?\s+|the\s+|some\s+)?(?P<style>(?:[\w-]+\s+){{0,2}}?)(?P<noun>{_IMAGE_NOUNS})\s+"
+    r"(?P<link>of|showing|depicting|with)\s+(?P<subject>.+?)[\s.!?]*$",
+    re.IGNORECASE,
+)
+# draw/paint/sketch take the subject itself as the object, with an article: "draw a cat"
+_VISUAL_REQUEST = re.compile(
+    _POLITE + r"(?P<verb>draw|paint|sketch)\s+(?:me\s+)?(?P<article>an?|some|the|two|three|\d+)\s+"
+    r"(?P<subject>.+?)[\s.!?]*$",
+    re.IGNORECASE,
+)
+# Objects of draw/paint/sketch that are figures of speech, not pictures ("draw a conclusion")
+_FIGURATIVE_OBJECTS = {
+    "conclusion", "conclusions", "comparison", "comparisons", "parallel", "parallels", "distinction",
+    "line", "blank", "breath", "crowd", "card", "plan", "outline", "roadmap",
+}
+# "Paint a picture of ..." is usually a figure of speech ("... of the economy")
+_FIGURATIVE = re.compile(r"\bpaint\s+(?:me\s+)?an?\s+(?:\w+\s+)?picture\s+of\b", re.IGNORECASE)
+# Programming cues: "create an image classifier", "where is the bug" are coding tasks, not tool calls
+_CODE = re.compile(
+    r"\b(?:code|coding|function|method|bug|debug|exception|stack ?trace|script|program|compile|classifier|"
+    r"regex|sql|async|pytorch|tensorflow|python|javascript|typescript|css|html)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Rule:
+    """Regex cue for an intent; the strongest matching rule sets the confidence"""
+
+    intent: str
+    pattern: re.Pattern
+    confidence: float
+
+
+SEARCH_RULES = [
+    Rule("search", re.compile(r"^\s*(?:search(?:\s+for)?|look up|google)\b", re.I), 0.95),
+    Rule("search", re.compile(r"^\s*find\s+(?:me\s+)?(?:the\s+)?(?:latest|news|articles?|information|info)\b", re.I), 0.95),
+    Rule("search", re.compile(r"^\s*what(?:'s| is| are| was| were)\s+(?:the\s+)?(?:latest|current|price|population|weather|score|capital)\b", re.I), 0.9),
+    Rule("search", re.compile(r"\b(?:latest|breaking)\s+(?:news|headlines|updates?|results?|scores?|version|release)\b", re.I), 0.9),
+    Rule("search", re.compile(r"\b(?:weather|forecast|stock price|share price|exchange rate|score)\s+(?:in|for|of|at|today|tonight|tomorrow|now)\b", re.I), 0.9),
+    Rule("search", re.compile(r"\b(?:news|headlines)\s+(?:about|on|from)\b|\btoday'?s\s+(?:news|headlines|weather|games?|matches)\b", re.I), 0.85),
+]
+
+# A who/when/where/what/which question is a lookup when it names an entity or asks about a dated fact;
+# otherwise ("when is it appropriate to ...", "where is the bug ...") it is left to the model
+_QUESTION = re.compile(r"^\s*(?:who|when|where|what|which)\b", re.IGNORECASE)
+_TIME_BOUND = re.compile(
+    r"\b(?:latest|current(?:ly)?|recent(?:ly)?|now|today|yesterday|tonight|upcoming|next|"
+    r"(?:this|last) (?:week|month|year|season)|(?:19|20)\d\d)\b",
+    re.IGNORECASE,
+)
+QUESTION_CONFIDENCE = 0.85  # Question about a named entity or a time-bound fact
+VAGUE_QUESTION_CONFIDENCE = 0.6  # Any other question: below the default threshold
+
+# Cues that the user wants a conversation, code or an opinion rather than a lookup
+_NOT_A_LOOKUP = re.compile(
+    r"\b(?:you|your|yourself|write|code|explain|summari[sz]e|translate|calculate|poem|story|joke|opinion|should i)\b",
+    re.IGNORECASE,
+)
+# Cues that an image request is really a question about images
+_ABOUT_IMAGES = re.compile(r"\b(?:how|why|which|best|tools?|software|apps?|tutorial)\b", re.IGNORECASE)
+
+
+def names_entity(query: str) -> bool:
+    """Whether a query names something: a capitalized word or acronym after its first word"""
+    for word in query.split()[1:]:
+        word = word.strip("?!.,:;'\"()")
+        if word[:1].isupper() and word not in ("I", "I'm", "I've", "I'd", "I'll"):
+            return True
+    return False
+
+
+@dataclass
+class Route:
+    """A query routed straight to a tool"""
+
+    intent: str
+    tool: BaseTool
+    arguments: dict
+    confidence: float
+    result: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def verbatim(self) -> bool:
+        return self.intent in FAST_PATH_VERBATIM
+
+    def task(self, query: str) -> list[BaseChatMessage]:
+        """The turn handed to the model: the question plus the tool output it would have asked for"""
+        call = f"{self.tool.name}({json.dumps(self.arguments, ensure_ascii=False)})"
+        return [
+            TextMessage(content=query, source="user"),
+            TextMessage(
+                content=f"Output of {call}, already run for this question; answer from it:\n{self.result}",
+                source="fast_path",
+            ),
+        ]
+
+
+def intent_tools(tools: Iterable[BaseTool]) -> dict[str, BaseTool]:
+    """Map each intent to the available tool that serves it"""
+    mapping = {}
+    for tool in tools:
+        if tool.name == "search":
+            mapping.setdefault("search", tool)
+        elif "image" in tool.name.lower():
+            mapping.setdefault("image", tool)
+    return mapping
+
+
+class IntentRouter:
+    """Cheap keyword/regex intent classifier for the obvious tool requests.
+
+    Returns a route only when its confidence reaches `threshold`; everything
+    else is left to the model's own planning.
+    """
+
+    def __init__(self, threshold: float = FAST_PATH_THRESHOLD):
+        self.threshold = threshold
+        self.queries = 0
+        self.routed = 0
+        self.fallbacks = 0  # Routed, but the tool failed and the model took over
+
+    def classify(self, query: str) -> tuple[Optional[str], float, dict]:
+        """(intent, confidence, tool arguments) of a query; intent is None when nothing matches"""
+        image = self._classify_image(query)
+        if image is not None:
+            return image
+
+        confidence = max((rule.confidence for rule in SEARCH_RULES if rule.pattern.search(query)), default=0.0)
+        if not confidence and _QUESTION.match(query):
+            named = names_entity(query) or _TIME_BOUND.search(query)
+            confidence = QUESTION_CONFIDENCE if named else VAGUE_QUESTION_CONFIDENCE
+        if not confidence:
+            return None, 0.0, {}
+        if _NOT_A_LOOKUP.search(query) or _CODE.search(query):
+            confidence -= 0.4
+        return "search", confidence, {"query": query.strip()}
+
+    @staticmethod
+    def _classify_image(query: str) -> Optional[tuple[str, float, dict]]:
+        if _CODE.search(query):
+            return None
+        image = _IMAGE_REQUEST.match(query)
+        if image:
+            confidence = 0.95
+            # "an image of a cat" is just "a cat"; "a watercolor painting of a fox" keeps its style
+            prompt = image.group("subject")
+            if image.group("style") or image.group("link").lower() == "with":
+                prompt = f"{image.group('style')}{image.group('noun')} {image.group('link')} {prompt}"
+        else:
+            image = _VISUAL_REQUEST.match(query)
+            if not image:
+                return None
+            confidence = 0.85
+            prompt = f"{image.group('article')} {image.group('subject')}"
+            if image.group("subject").split()[0].lower() in _FIGURATIVE_OBJECTS:
+                confidence -= 0.4
+        if _ABOUT_IMAGES.search(query):
+            confidence -= 0.5
+        if _FIGURATIVE.search(query):
+            confidence -= 0.3
+        return "image", confidence, {"prompt": prompt}
+
+    def route(self, query: str, tools: Iterable[BaseTool]) -> Optional[Route]:
+        self.queries += 1
+        intent, confidence, arguments = self.classify(query)
+        tool = intent_tools(tools).get(intent)
+        if tool is None or confidence < self.threshold:
+            return None
+        return Route(intent, tool, arguments, confidence)
+
+    def stats(self) -> dict:
+        return {"queries": self.queries, "routed": self.routed, "fallbacks": self.fallbacks}
+
+
+router = IntentRouter()
+
+
+async def try_fast_path(query: str, tools: Iterable[BaseTool], cancellation: QueryCancellation) -> Optional[Route]:
+    """Run the tool for an obvious intent directly, skipping the model's planning round trip.
+
+    Returns the route with its result, or None when the query is ambiguous,
+    the fast path is disabled, or the tool failed (the model then handles the
+    query as usual). A cancelled query also returns None; the caller's run
+    stops at once on the already-cancelled token.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    route = router.route(query, tools)
+    if route is None:
+        return None
+    attributes = {"fast_path.intent": route.intent, "fast_path.confidence": route.confidence}
+    with tracer.start_as_current_span("fast_path", attributes=attributes):
+        call = asyncio.ensure_future(route.tool.run_json(route.arguments, cancellation.token))
+        cancellation.token.link_future(call)
+        try:
+            value = await call
+        except asyncio.CancelledError:
+            if not cancellation.cancelled:
+                raise
+            return None
+        except Exception as e:
+            router.fallbacks += 1
+            print(f"⚠️ Fast path {route.tool.name} failed, asking the model instead: {e}")
+            return None
+    route.result = route.tool.return_value_as_string(value)
+    router.routed += 1
+    print(f"⚡ Fast path: {route.intent} ({route.confidence:.0%}) → {route.tool.name}")
+    return route
+
+
+def format_fast_path_stats() -> Optional[str]:
+    """One-line summary of the router's counters, if it saw any query"""
+    if not FAST_PATH_ENABLED or not router.queries:
+        return None
+    stats = router.stats()
+    return (
+        f"⚡ Fast path: {stats['routed']} of {stats['queries']} queries routed without a planning call, "
+        f"{stats['fallbacks']} fell back to the model"
+    )
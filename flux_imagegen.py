@@ -1,7 +1,10 @@
+import asyncio
+
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 from dotenv import load_dotenv
 import os
+from schema_cache import load_cached_tools, store_tools
 
 load_dotenv()
 
@@ -12,6 +15,12 @@ params = {"api_key": os.getenv("API_KEY")}
 url = f"{base_url}?{urlencode(params)}"
 
 async def main():
+    # Use cached tool schemas when available, no connection needed
+    tools = await asyncio.to_thread(load_cached_tools, url)
+    if tools:
+        print(f"Available tools (cached): {', '.join(tools)}")
+        return
+
     # Connect to the server using HTTP client
     async with streamablehttp_client(url) as (read, write, _):
         async with ClientSession(read, write) as session:
@@ -21,8 +30,8 @@ async def main():
             # List available tools
             tools_result = await session.list_tools()
             print(tools_result)
+            await asyncio.to_thread(store_tools, url, tools_result.tools)
             print(f"Available tools: {', '.join([t.name for t in tools_result.tools])}")
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
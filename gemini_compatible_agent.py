@@ -1,6 +1,5 @@
 import asyncio
 import json
-import aiohttp
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from autogen_ext.tools.mcp import (
     StreamableHttpMcpToolAdapter,
@@ -13,8 +12,26 @@ import os
 from dotenv import load_dotenv
 from urllib.parse import urlencode
 from autogen_agentchat.teams import RoundRobinGroupChat
+from autogen_agentchat.conditions import TextMessageTermination
 from autogen_core.tools import FunctionTool
 from typing import Annotated
+from http_pool import get_http_pool, close_http_pool
+from image_cache import get_image_cache
+from mcp_bootstrap import bootstrap_tools
+from model_client import MODEL_STREAM, close_model_client, get_model_client
+from context_budget import create_model_context
+from search_cache import cache_key, close_search_caches, format_cache_stats, with_search_cache
+from single_flight import with_single_flight
+from resilience import format_latency_stats, with_resilience
+from result_compaction import format_compaction_stats, with_compaction
+from completion_cache import format_completion_cache_stats
+from local_index import format_local_index_stats, local_search_hint, local_search_tools, with_local_index
+from async_console import REPL_CONCURRENCY, run_repl
+from deadline import QueryCancellation, report_outcome, run_with_deadline
+from fast_path import format_fast_path_stats, try_fast_path
+from event_sink import close_event_sink
+from mcp_pool import close_mcp_pools
+from tracing import query_span, setup_tracing, traced_stream
 
 load_dotenv()
 
@@ -30,6 +47,19 @@ IMAGE_PARAMS = {"api_key": "a9a64c1b-ddb1-4503-bb49-dfd7ab938c7b"}
 IMAGE_URL = f"{IMAGE_BASE_URL}?{urlencode(IMAGE_PARAMS)}"
 
 
+async def _post_json(url: str, payload: dict, cancellation_token: CancellationToken = None) -> tuple[int, str]:
+    """POST a JSON-RPC request over the shared pool; the request is abandoned if the token is cancelled"""
+    async def exchange():
+        session = await get_http_pool().get_session()
+        async with session.post(url, json=payload, headers={"Content-Type": "application/json"}) as response:
+            return response.status, await response.text()
+
+    request = asyncio.ensure_future(exchange())
+    if cancellation_token is not None:
+        cancellation_token.link_future(request)
+    return await request
+
+
 async def generate_image_url(
     prompt: Annotated[str, "The text description of the image to generate"],
     model: Annotated[str, "Model name to use for generation"] = "flux",
@@ -37,15 +67,18 @@ async def generate_image_url(
     height: Annotated[int, "Height of the generated image"] = 1024,
     enhance: Annotated[bool, "Whether to enhance the prompt using an LLM"] = True,
     safe: Annotated[bool, "Whether to apply content filtering"] = False,
-    seed: Annotated[int, "Seed for reproducible results"] = None
+    seed: Annotated[int, "Seed for reproducible results"] = None,
+    cancellation_token: CancellationToken = None,
 ) -> str:
     """Generate an image URL from a text prompt using the Flux MCP server."""
     
     try:
+        pool = get_http_pool()
+
         # Prepare the MCP request
         mcp_request = {
             "jsonrpc": "2.0",
-            "id": 1,
+            "id": pool.next_request_id(),
             "method": "tools/call",
             "params": {
                 "name": "generateImageUrl",
@@ -64,38 +97,41 @@ async def generate_image_url(
         if seed is not None:
             mcp_request["params"]["arguments"]["seed"] = seed
         
-        # Make the HTTP request to the MCP server
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                IMAGE_URL,
-                json=mcp_request,
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if "result" in result and "content" in result["result"]:
-                        content = result["result"]["content"]
-                        if isinstance(content, list) and len(content) > 0:
-                            # Extract the image URL from the response
-                            response_text = content[0].get("text", "")
-                            try:
-                                # Parse the JSON response to get the image URL
-                                image_data = json.loads(response_text)
-                                image_url = image_data.get("imageUrl", "")
-                                if image_url:
-                                    return f"✅ Image generated successfully!\n🖼️ Image URL: {image_url}\n📝 Prompt: {prompt}\n🎨 Model: {model}\n📐 Size: {width}x{height}"
-                                else:
-                                    return f"❌ Failed to generate image: No URL in response"
-                            except json.JSONDecodeError:
-                                return f"❌ Failed to parse image generation response: {response_text}"
-                        else:
-                            return f"❌ Failed to generate image: Empty response content"
+        # Serve reproducible requests from the content-addressed cache
+        image_cache = get_image_cache()
+        arguments = mcp_request["params"]["arguments"]
+        cached = await image_cache.get(arguments, "text")
+        if cached is not None:
+            return cached["result"]
+        
+        # Make the HTTP request to the MCP server over the shared connection pool
+        status, body = await _post_json(IMAGE_URL, mcp_request, cancellation_token)
+        if status != 200:
+            return f"❌ Failed to generate image: HTTP {status} - {body}"
+
+        result = json.loads(body)
+        if "result" in result and "content" in result["result"]:
+            content = result["result"]["content"]
+            if isinstance(content, list) and len(content) > 0:
+                # Extract the image URL from the response
+                response_text = content[0].get("text", "")
+                try:
+                    # Parse the JSON response to get the image URL
+                    image_data = json.loads(response_text)
+                    image_url = image_data.get("imageUrl", "")
+                    if image_url:
+                        result_text = f"✅ Image generated successfully!\n🖼️ Image URL: {image_url}\n📝 Prompt: {prompt}\n🎨 Model: {model}\n📐 Size: {width}x{height}"
+                        await image_cache.put(arguments, result_text, image_url, "text")
+                        return result_text
                     else:
-                        return f"❌ Failed to generate image: Invalid response format"
-                else:
-                    error_text = await response.text()
-                    return f"❌ Failed to generate image: HTTP {response.status} - {error_text}"
-                    
+                        return f"❌ Failed to generate image: No URL in response"
+                except json.JSONDecodeError:
+                    return f"❌ Failed to parse image generation response: {response_text}"
+            else:
+                return f"❌ Failed to generate image: Empty response content"
+        else:
+            return f"❌ Failed to generate image: Invalid response format"
+                
     except Exception as e:
         return f"❌ Error generating image: {str(e)}"
 
@@ -105,26 +141,21 @@ async def setup_tools():
     tools = []
     
     try:
-        # Setup Search Tool (MCP)
-        print("🔧 Setting up DuckDuckGo search tool...")
-        search_server_params = StreamableHttpServerParams(
-            url=SEARCH_URL,
-            headers={},
-            timeout=30.0,
-            sse_read_timeout=300.0,
-            terminate_on_close=True,
-        )
-        
-        search_adapter = await StreamableHttpMcpToolAdapter.from_server_params(
-            search_server_params, "search"
-        )
-        tools.append(search_adapter)
-        print("✅ Search tool connected!")
+        # Setup Search Tool (MCP), bounded by the per-server timeout
+        adapters = await bootstrap_tools([("Search", SEARCH_URL, "search")])
+        if adapters["Search"] is None:
+            print("❌ Error setting up tools: search tool unavailable")
+            return []
+        search = with_resilience(adapters["Search"], idempotent=True)
+        # Index only results fetched from the server, not search cache hits
+        search = with_local_index(search)
+        tools.append(with_compaction(with_search_cache(with_single_flight(search, key_fn=cache_key))))
+        tools.extend(with_compaction(tool) for tool in local_search_tools())
         
         # Setup Custom Image Generation Tool (Direct HTTP)
         print("🔧 Setting up custom image generation tool...")
         image_tool = FunctionTool(generate_image_url, description="Generate an image URL from a text prompt")
-        tools.append(image_tool)
+        tools.append(with_compaction(with_single_flight(with_resilience(image_tool, idempotent=False))))
         print("✅ Custom image generation tool created!")
         
         return tools
@@ -134,29 +165,7 @@ async def setup_tools():
         return []
 
 
-async def main() -> None:
-    """Main function to run the multi-tool AutoGen agent"""
-    
-    # Setup tools
-    tools = await setup_tools()
-    
-    if not tools:
-        print("❌ Failed to setup tools. Exiting.")
-        return
-    
-    # Create model client using Gemini
-    model_client = OpenAIChatCompletionClient(
-        model="gemini-1.5-flash-8b",
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
-    print("✅ Gemini model client created!")
-
-    # Create multi-tool agent
-    multi_agent = AssistantAgent(
-        name="multi_tool_agent",
-        model_client=model_client,
-        tools=tools,
-        system_message="""You are a helpful AI assistant with access to multiple tools:
+SYSTEM_MESSAGE = """You are a helpful AI assistant with access to multiple tools:
 
 1. **Search Tool**: Use this to search the web for information, current events, facts, news, etc.
    - Use when users ask questions about current events, facts, research, "what is", "who is", etc.
@@ -179,20 +188,62 @@ async def main() -> None:
 - If unclear, ask the user to clarify what they want
 - Always be helpful and choose the most appropriate tool based on the user's request
 
-When generating images, use descriptive prompts for better results and consider the optional parameters to customize the output.""",
+When generating images, use descriptive prompts for better results and consider the optional parameters to customize the output."""
+
+
+def create_agent(model_client, tools) -> AssistantAgent:
+    """Create the multi-tool agent for the given tools"""
+    return AssistantAgent(
+        name="multi_tool_agent",
+        model_client=model_client,
+        tools=tools,
+        system_message=SYSTEM_MESSAGE + local_search_hint(tools),
+        model_client_stream=MODEL_STREAM,
+        model_context=create_model_context(model_client),
+    )
+
+
+def create_team(model_client, tools, multi_agent: AssistantAgent = None) -> RoundRobinGroupChat:
+    """Create a team with its own conversation state; a new agent is made if none is given.
+
+    A turn ends at the agent's first text answer; max_turns only caps tool-call rounds.
+    """
+    return RoundRobinGroupChat(
+        [multi_agent or create_agent(model_client, tools)],
+        termination_condition=TextMessageTermination("multi_tool_agent"),
+        max_turns=5,
     )
+
+
+async def main() -> None:
+    """Main function to run the multi-tool AutoGen agent"""
+    setup_tracing()
+    
+    # Setup tools
+    tools = await setup_tools()
+    
+    if not tools:
+        print("❌ Failed to setup tools. Exiting.")
+        return
+    
+    # Create model client using Gemini (shared and rate limited)
+    model_client = get_model_client()
+    print("✅ Gemini model client created!")
+
+    # Create multi-tool agent
+    multi_agent = create_agent(model_client, tools)
     
     # Create user proxy agent
     user_proxy = UserProxyAgent(name="user_proxy")
     
     # Create team
-    team = RoundRobinGroupChat([multi_agent], max_turns=5)
+    team = create_team(model_client, tools, multi_agent)
     
     print(f"\n🤖 Multi-Tool AutoGen Agent (Gemini + Custom Tools) is ready! ({len(tools)} tools loaded)")
     print("I can help you with:")
     print("  🔍 Web search and information lookup")
     print("  🎨 Image generation from text descriptions")
-    print("Type 'exit' to quit.\n")
+    print("Type 'exit' to quit or 'cancel' (Ctrl-C) to stop the current answer.\n")
 
     # Example queries
     print("💡 Example queries you can try:")
@@ -206,34 +257,54 @@ When generating images, use descriptive prompts for better results and consider
     print("    • Draw a sunset over mountains")
     print()
 
-    # Interactive loop
-    while True:
-        try:
-            # Get user input
-            user_query = input("You: ").strip()
-            
-            if user_query.lower() in ['exit', 'quit', 'bye']:
-                print("👋 Goodbye!")
-                break
-                
-            if not user_query:
-                print("Please enter a valid query.")
-                continue
-            
-            print(f"\n🤖 Processing: {user_query}")
-            print("-" * 50)
-            
-            # Run the conversation
-            stream = team.run_stream(task=user_query)
-            await Console(stream)
-            print("\n" + "="*60 + "\n")
-            
-        except KeyboardInterrupt:
-            print("\n👋 Goodbye!")
-            break
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            print("Please try again.\n")
+    # Interactive loop: the next question can be typed while an answer is streaming
+    async def handle(user_query: str, render, cancellation: QueryCancellation):
+        nonlocal team
+        print(f"\n🤖 Processing: {user_query}")
+        print("-" * 50)
+
+        # Run the conversation, traced per phase and bounded by the query deadline;
+        # queries answered side by side each get their own conversation
+        shared = REPL_CONCURRENCY <= 1
+        with query_span(user_query):
+            # Obvious intents run their tool directly instead of waiting for the model to pick it
+            route = await try_fast_path(user_query, tools, cancellation)
+            if route is not None and route.verbatim:
+                print(route.result)
+                print("\n" + "="*60 + "\n")
+                return
+            outcome = await run_with_deadline(
+                team if shared else create_team(model_client, tools),
+                route.task(user_query) if route is not None else user_query,
+                render=lambda stream: render(traced_stream(stream)),
+                cancellation=cancellation,
+                create_team=(lambda: create_team(model_client, tools)) if shared else None,
+            )
+        if outcome.team is not None:
+            # A cancelled team cannot run again; continue from the state before this query
+            team = outcome.team
+        report_outcome(outcome, cancellation)
+        print("\n" + "="*60 + "\n")
+
+    await run_repl(handle)
+    for stats in (
+        format_cache_stats(tools[0]),
+        format_latency_stats(tools),
+        format_compaction_stats(tools),
+        format_fast_path_stats(),
+        format_completion_cache_stats(model_client),
+        format_local_index_stats(),
+    ):
+        if stats:
+            print(stats)
+    print("👋 Goodbye!")
+
+    # Flush recorded events, release pooled HTTP connections and MCP sessions, close the caches
+    await close_event_sink()
+    await close_http_pool()
+    await close_mcp_pools()
+    await close_model_client()
+    close_search_caches()
 
 
 if __name__ == "__main__":
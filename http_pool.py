@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import os
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool configuration
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))  # Total open connections
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))  # Open connections per host
+HTTP_POOL_KEEPALIVE = float(os.getenv("HTTP_POOL_KEEPALIVE", "60.0"))  # Idle keep-alive in seconds
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30.0"))  # Total request timeout in seconds
+
+
+class HttpPool:
+    """Shared aiohttp session with keep-alive and per-host connection limits.
+
+    The underlying session is created lazily on first use and recreated if it
+    was closed or belongs to a different event loop, so one pool can serve every
+    HTTP call in the process.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_POOL_KEEPALIVE,
+        timeout: float = HTTP_POOL_TIMEOUT,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._ids = itertools.count(1)
+
+    def next_request_id(self) -> int:
+        """Return a monotonically increasing JSON-RPC request id"""
+        return next(self._ids)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is loop:
+            return self._session
+
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+            # A session from another (finished) loop cannot be reused or closed here
+            self._session = None
+
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=300,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                )
+            return self._session
+
+    async def close(self):
+        """Close the shared session and release pooled connections"""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def __aenter__(self) -> "HttpPool":
+        await self.get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+_default_pool: Optional[HttpPool] = None
+
+
+def get_http_pool() -> HttpPool:
+    """Return the process-wide HTTP pool"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = HttpPool()
+    return _default_pool
+
+
+async def close_http_pool():
+    """Close the process-wide HTTP pool, if it was ever used"""
+    if _default_pool is not None:
+        await _default_pool.close()
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from http_pool import get_http_pool
+from tool_wrappers import DelegatingTool, decode_tool_result, encode_tool_result
+
+load_dotenv()
+
+# Image cache configuration
+IMAGE_CACHE_MODE = os.getenv("IMAGE_CACHE_MODE", "seeded").lower()  # "seeded", "all" or "off"
+IMAGE_CACHE_DIR = os.path.expanduser(os.getenv("IMAGE_CACHE_DIR", "~/.cache/autogen_mcp/images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+IMAGE_CACHE_DOWNLOAD = os.getenv("IMAGE_CACHE_DOWNLOAD", "false").lower() in ("1", "true", "yes")
+
+# Defaults of the Flux generateImageUrl tool, used to canonicalize arguments
+IMAGE_DEFAULTS = {"model": "flux", "width": 1024, "height": 1024, "enhance": True, "safe": False}
+
+_IMAGE_URL_PATTERN = re.compile(r'"imageUrl"\s*:\s*"([^"]+)"|Image URL: (\S+)')
+
+
+def canonical_image_arguments(arguments: dict) -> dict:
+    """Fill in defaults and drop unset fields so equivalent requests compare equal"""
+    canonical = {**IMAGE_DEFAULTS, **{k: v for k, v in arguments.items() if v is not None}}
+    for name in ("width", "height", "seed"):
+        if isinstance(canonical.get(name), float) and canonical[name].is_integer():
+            canonical[name] = int(canonical[name])
+    return canonical
+
+
+def extract_image_url(value: Any) -> Optional[str]:
+    """Find the image URL in a Flux tool result (a string or MCP content blocks)"""
+    texts = [value] if isinstance(value, str) else [getattr(item, "text", "") for item in value or []]
+    for text in texts:
+        match = _IMAGE_URL_PATTERN.search(text)
+        if match is not None:
+            return match.group(1) or match.group(2)
+    return None
+
+
+class ImageCache:
+    """Content-addressed store of image generation results.
+
+    Entries are keyed by a hash of the canonical argument tuple and the result
+    format ("text" for a formatted string, "content" for MCP content blocks), so
+    callers that shape results differently never read back each other's
+    entries. Each entry is a small JSON file holding the tool result and image
+    URL, plus the downloaded image bytes when downloading is enabled. All file
+    I/O runs off the event loop. The directory size is tracked as entries are
+    written, and the least recently used entries are evicted once it grows
+    beyond `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: str = IMAGE_CACHE_DIR,
+        max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+        mode: str = IMAGE_CACHE_MODE,
+        download: bool = IMAGE_CACHE_DOWNLOAD,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.download = download
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size: Optional[int] = None  # Bytes in the directory, counted on the first write
+        self._size_lock = threading.Lock()
+        if self.mode != "off":
+            os.makedirs(self.directory, exist_ok=True)
+
+    def is_cacheable(self, arguments: dict) -> bool:
+        """Seeded mode only caches reproducible requests: a seed and no prompt enhancement"""
+        if self.mode == "off":
+            return False
+        if self.mode == "all":
+            return True
+        canonical = canonical_image_arguments(arguments)
+        return canonical.get("seed") is not None and not canonical["enhance"]
+
+    def key(self, arguments: dict, result_format: str) -> str:
+        canonical = json.dumps(
+            {"format": result_format, "arguments": canonical_image_arguments(arguments)},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def image_path(self, arguments: dict, result_format: str) -> Optional[str]:
+        """Path of the downloaded image bytes, if they were cached"""
+        path = os.path.join(self.directory, f"{self.key(arguments, result_format)}.img")
+        return path if os.path.exists(path) else None
+
+    async def get(self, arguments: dict, result_format: str) -> Optional[dict]:
+        """Return the cached entry ({"result", "image_url", ...}) or None"""
+        if not self.is_cacheable(arguments):
+            return None
+        entry = await asyncio.to_thread(self._read, self._entry_path(self.key(arguments, result_format)))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry["result"] = decode_tool_result(entry["result"])
+        return entry
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry
+
+    async def put(self, arguments: dict, result: Any, image_url: Optional[str], result_format: str):
+        """Store a successful generation and optionally its image bytes"""
+        if not self.is_cacheable(arguments):
+            return
+        key = self.key(arguments, result_format)
+        entry = {
+            "arguments": canonical_image_arguments(arguments),
+            "image_url": image_url,
+            "result": encode_tool_result(result),
+            "created_at": time.time(),
+        }
+
+        image_bytes = None
+        if self.download and image_url:
+            try:
+                session = await get_http_pool().get_session()
+                async with session.get(image_url) as response:
+                    if response.status == 200:
+                        image_bytes = await response.read()
+            except Exception as e:
+                print(f"⚠️ Could not download image for cache: {e}")
+
+        await asyncio.to_thread(self._write, key, entry, image_bytes)
+
+    def _write(self, key: str, entry: dict, image_bytes: Optional[bytes]):
+        written = 0
+        if image_bytes is not None:
+            image_path = os.path.join(self.directory, f"{key}.img")
+            written += len(image_bytes) - _file_size(image_path)
+            with open(image_path, "wb") as f:
+                f.write(image_bytes)
+        tmp_path = f"{self._entry_path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        written += os.path.getsize(tmp_path) - _file_size(self._entry_path(key))
+        os.replace(tmp_path, self._entry_path(key))
+        with self._size_lock:
+            if self._size is None:
+                self._evict()  # Counts the directory once
+            else:
+                self._size += written
+                if self._size > self.max_bytes:
+                    self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes, and recount its size"""
+        entries: dict[str, list] = {}
+        total = 0
+        for item in os.scandir(self.directory):
+            key, ext = os.path.splitext(item.name)
+            if ext not in (".json", ".img"):
+                continue
+            stat = item.stat()
+            total += stat.st_size
+            group = entries.setdefault(key, [0.0, 0, []])
+            group[0] = max(group[0], stat.st_mtime)
+            group[1] += stat.st_size
+            group[2].append(item.path)
+
+        for key, (_, size, paths) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+_default_cache: Optional[ImageCache] = None
+
+
+def get_image_cache() -> ImageCache:
+    """Return the process-wide image cache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ImageCache()
+    return _default_cache
+
+
+class CachedImageTool(DelegatingTool):
+    """Image generation tool wrapper that serves deterministic requests from the ImageCache."""
+
+    def __init__(self, inner: BaseTool, cache: Optional[ImageCache] = None):
+        super().__init__(inner)
+        self.cache = cache or get_image_cache()
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        arguments = args.model_dump(exclude_unset=True)
+        entry = await self.cache.get(arguments, "content")
+        if entry is not None:
+            return entry["result"]
+
+        value = await self._inner.run(args, cancellation_token)
+        image_url = extract_image_url(value)
+        if image_url:
+            await self.cache.put(arguments, value, image_url, "content")
+        return value
+
+
+def with_image_cache(tool: BaseTool) -> BaseTool:
+    """Wrap an image generation tool with the content-addressed cache if enabled"""
+    return CachedImageTool(tool) if IMAGE_CACHE_MODE != "off" else tool
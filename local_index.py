@@ -0,0 +1,347 @@
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from typing import Any, Iterable, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from result_compaction import SearchHit, parse_search_results, result_text, terms, words
+from sqlite_store import connect_sqlite
+from tool_wrappers import DelegatingTool
+
+load_dotenv()
+
+# Local search index configuration
+LOCAL_SEARCH_ENABLED = os.getenv("LOCAL_SEARCH_ENABLED", "false").lower() in ("1", "true", "yes")
+LOCAL_SEARCH_DB = os.path.expanduser(os.getenv("LOCAL_SEARCH_DB", "~/.cache/autogen_mcp/search_index.sqlite"))
+LOCAL_SEARCH_MAX_AGE = float(os.getenv("LOCAL_SEARCH_MAX_AGE", "86400"))  # Seconds an indexed result stays usable
+LOCAL_SEARCH_MIN_MATCH = float(os.getenv("LOCAL_SEARCH_MIN_MATCH", "0.6"))  # Share of query terms a result must contain
+LOCAL_SEARCH_COMPACT_EVERY = int(os.getenv("LOCAL_SEARCH_COMPACT_EVERY", "50"))  # Indexed searches between compaction checks
+
+LOCAL_SEARCH_HINT = """
+
+You also have a **local_search** tool over the results of earlier web searches. It answers in milliseconds:
+try it first when a question may have been searched before, and use the web search tool when it finds
+nothing relevant or the user needs up-to-the-minute information."""
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keep references to background indexing tasks so they are not garbage collected
+_index_tasks: set[asyncio.Task] = set()
+
+
+def encode_postings(postings: Iterable[tuple[int, int]], previous_id: int = 0) -> bytes:
+    """Varint-encode (doc id, term frequency) pairs, doc ids as gaps from the previous id"""
+    out = bytearray()
+    for doc_id, tf in postings:
+        for number in (doc_id - previous_id, tf):
+            while number >= 0x80:
+                out.append((number & 0x7F) | 0x80)
+                number >>= 7
+            out.append(number)
+        previous_id = doc_id
+    return bytes(out)
+
+
+def decode_postings(data: bytes) -> list[tuple[int, int]]:
+    """Inverse of encode_postings"""
+    numbers = []
+    number = shift = 0
+    for byte in data:
+        number |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            numbers.append(number)
+            number = shift = 0
+    postings = []
+    doc_id = 0
+    for gap, tf in zip(numbers[::2], numbers[1::2]):
+        doc_id += gap
+        postings.append((doc_id, tf))
+    return postings
+
+
+def term_frequencies(text: str) -> dict[str, int]:
+    frequencies: dict[str, int] = {}
+    for term in terms(text):
+        frequencies[term] = frequencies.get(term, 0) + 1
+    return frequencies
+
+
+class LocalSearchIndex:
+    """Persistent BM25 index over search results.
+
+    Each result (one page) is a document scored over its title and summary.
+    Postings are stored per term in SQLite as a single blob of varint-encoded
+    doc id gaps and term frequencies, and new documents are appended to the
+    blobs as they arrive. A page seen again replaces its old document (whose
+    postings become dead until the next compaction) or, if unchanged, just
+    becomes fresh again. Results older than `max_age` are not returned, and
+    are dropped when the index compacts itself, which it checks for every
+    `compact_every` calls to `add`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = LOCAL_SEARCH_DB,
+        max_age: float = LOCAL_SEARCH_MAX_AGE,
+        compact_every: int = LOCAL_SEARCH_COMPACT_EVERY,
+    ):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.compact_every = max(1, compact_every)
+        self.searches = 0
+        self.hits = 0
+        self._adds = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # auto_vacuum only takes effect on a new database; lets compaction return free pages without a full VACUUM
+        with self._connect(pragmas=["auto_vacuum=INCREMENTAL"]) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, "
+                "title TEXT NOT NULL, url TEXT NOT NULL, summary TEXT NOT NULL, length INTEGER NOT NULL, "
+                "added_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, last_id INTEGER NOT NULL, "
+                "data BLOB NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connect(self, pragmas: Iterable[str] = ()) -> sqlite3.Connection:
+        return connect_sqlite(self.db_path, pragmas, isolation_level=None)
+
+    def add(self, hits: Iterable[SearchHit]) -> int:
+        """Index search results; returns how many documents were added or replaced"""
+        now = time.time()
+        added = 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for hit in hits:
+                row = conn.execute("SELECT id, title, summary FROM docs WHERE key = ?", (hit.url_key,)).fetchone()
+                if row is not None and (row[1], row[2]) == (hit.title, hit.summary):
+                    conn.execute("UPDATE docs SET added_at = ? WHERE id = ?", (now, row[0]))
+                    continue
+                if row is not None:
+                    conn.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+                    conn.execute(
+                        "INSERT INTO meta (name, value) VALUES ('dead', 1) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+                    )
+                frequencies = term_frequencies(f"{hit.title} {hit.summary}")
+                doc_id = conn.execute(
+                    "INSERT INTO docs (key, title, url, summary, length, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (hit.url_key, hit.title, hit.url, hit.summary, sum(frequencies.values()), now),
+                ).lastrowid
+                for term, tf in frequencies.items():
+                    posting = conn.execute("SELECT last_id, data FROM postings WHERE term = ?", (term,)).fetchone()
+                    last_id, data = posting if posting is not None else (0, b"")
+                    conn.execute(
+                        "INSERT OR REPLACE INTO postings (term, last_id, data) VALUES (?, ?, ?)",
+                        (term, doc_id, data + encode_postings([(doc_id, tf)], previous_id=last_id)),
+                    )
+                added += 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self._adds += 1
+        if self._adds % self.compact_every == 0 and self._needs_compaction():
+            self.compact()
+        return added
+
+    def _needs_compaction(self) -> bool:
+        with self._connect() as conn:
+            dead = conn.execute("SELECT value FROM meta WHERE name = 'dead'").fetchone()
+            stale, live = conn.execute(
+                "SELECT COALESCE(SUM(added_at < ?), 0), COUNT(*) FROM docs", (time.time() - self.max_age,)
+            ).fetchone()
+        return (dead[0] if dead else 0) + stale > max(100, live // 2)
+
+    def compact(self):
+        """Drop stale documents and rewrite the postings without dead entries"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM docs WHERE added_at < ?", (time.time() - self.max_age,))
+            postings: dict[str, list[tuple[int, int]]] = {}
+            for doc_id, title, summary in conn.execute("SELECT id, title, summary FROM docs ORDER BY id"):
+                for term, tf in term_frequencies(f"{title} {summary}").items():
+                    postings.setdefault(term, []).append((doc_id, tf))
+            conn.execute("DELETE FROM postings")
+            conn.executemany(
+                "INSERT INTO postings (term, last_id, data) VALUES (?, ?, ?)",
+                ((term, entries[-1][0], encode_postings(entries)) for term, entries in postings.items()),
+            )
+            conn.execute("DELETE FROM meta WHERE name = 'dead'")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        with self._connect() as conn:
+            conn.execute("PRAGMA incremental_vacuum")
+
+    def search(
+        self, query: str, limit: int = 5, min_match: float = LOCAL_SEARCH_MIN_MATCH
+    ) -> list[tuple[float, SearchHit, float]]:
+        """Best fresh results for a query as (BM25 score, result, indexed at), best first.
+
+        Only results containing at least `min_match` of the query terms count,
+        so an unrelated question finds nothing rather than loosely related pages.
+        """
+        self.searches += 1
+        query_terms = words(query)
+        if not query_terms:
+            return []
+        with self._connect() as conn:
+            count, average_length = conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            if not count:
+                return []
+            placeholders = ",".join("?" * len(query_terms))
+            term_postings = {
+                term: decode_postings(data)
+                for term, data in conn.execute(
+                    f"SELECT term, data FROM postings WHERE term IN ({placeholders})", list(query_terms)
+                )
+            }
+            candidates = {doc_id for postings in term_postings.values() for doc_id, _ in postings}
+            docs = {}
+            candidate_list = list(candidates)
+            for start in range(0, len(candidate_list), 500):
+                chunk = candidate_list[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT id, title, url, summary, length, added_at FROM docs WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                docs.update({row[0]: row[1:] for row in rows})
+
+        fresh_after = time.time() - self.max_age
+        scores: dict[int, float] = {}
+        matched: dict[int, int] = {}
+        for postings in term_postings.values():
+            live = [(doc_id, tf) for doc_id, tf in postings if doc_id in docs]  # Skip replaced documents
+            if not live:
+                continue
+            idf = math.log(1 + (count - len(live) + 0.5) / (len(live) + 0.5))
+            for doc_id, tf in live:
+                length = docs[doc_id][3]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (average_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+
+        results = []
+        for doc_id, score in scores.items():
+            title, url, summary, _, added_at = docs[doc_id]
+            if added_at < fresh_after or matched[doc_id] < min_match * len(query_terms):
+                continue
+            results.append((score, SearchHit(0, title, url, summary), added_at))
+        results.sort(key=lambda result: -result[0])
+        if results:
+            self.hits += 1
+        return results[:limit]
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            documents = conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            terms = conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+        return {"documents": documents, "terms": terms, "searches": self.searches, "hits": self.hits}
+
+
+_default_index: Optional[LocalSearchIndex] = None
+
+
+def get_local_index() -> LocalSearchIndex:
+    """Return the process-wide local search index"""
+    global _default_index
+    if _default_index is None:
+        _default_index = LocalSearchIndex()
+    return _default_index
+
+
+class IndexingSearchTool(DelegatingTool):
+    """Search wrapper that adds every result it returns to the local index, in the background"""
+
+    def __init__(self, inner: BaseTool, index: Optional[LocalSearchIndex] = None):
+        super().__init__(inner)
+        self.index = index or get_local_index()
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        value = await self._inner.run(args, cancellation_token)
+        hits = parse_search_results(result_text(value) or "")
+        if hits:
+            task = asyncio.create_task(asyncio.to_thread(self.index.add, hits))
+            _index_tasks.add(task)
+            task.add_done_callback(self._indexed)
+        return value
+
+    @staticmethod
+    def _indexed(task: asyncio.Task):
+        _index_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ Could not index search results: {task.exception()}")
+
+
+class LocalSearchArgs(BaseModel):
+    query: str = Field(description="The search query")
+    max_results: int = Field(default=5, description="Maximum number of results to return")
+
+
+class LocalSearchTool(BaseTool[LocalSearchArgs, str]):
+    """The local index as a tool, answering in the same text format as the DuckDuckGo search tool"""
+
+    def __init__(self, index: Optional[LocalSearchIndex] = None):
+        super().__init__(
+            LocalSearchArgs,
+            str,
+            "local_search",
+            "Search the results of earlier web searches, stored locally. Fast, but only knows pages "
+            "that earlier searches returned; use the web search tool if nothing relevant is found.",
+        )
+        self.index = index or get_local_index()
+
+    async def run(self, args: LocalSearchArgs, cancellation_token: CancellationToken) -> str:
+        results = await asyncio.to_thread(self.index.search, args.query, args.max_results)
+        if not results:
+            return "No results found in the local index. Use the web search tool instead."
+        oldest = time.time() - min(added_at for _, _, added_at in results)
+        age = f"{oldest / 3600:.0f}h" if oldest >= 3600 else f"{oldest / 60:.0f}m"
+        lines = [f"Found {len(results)} local search results (indexed within the last {age}):\n"]
+        for number, (_, hit, _) in enumerate(results, start=1):
+            lines.append(f"{number}. {hit.title}\n   URL: {hit.url}\n   Summary: {hit.summary}\n")
+        return "\n".join(lines)
+
+
+def with_local_index(tool: BaseTool) -> BaseTool:
+    """Wrap the remote search tool so its results are indexed locally, if enabled"""
+    return IndexingSearchTool(tool) if LOCAL_SEARCH_ENABLED else tool
+
+
+def local_search_tools() -> list[BaseTool]:
+    """The local_search tool, if enabled, to offer the model next to the remote search"""
+    return [LocalSearchTool()] if LOCAL_SEARCH_ENABLED else []
+
+
+def local_search_hint(tools: Iterable[BaseTool]) -> str:
+    """System message addition that tells the model to try local_search first, if it has the tool"""
+    return LOCAL_SEARCH_HINT if any(tool.name == "local_search" for tool in tools) else ""
+
+
+def format_local_index_stats() -> Optional[str]:
+    """One-line summary of the local index, if it was searched"""
+    if not LOCAL_SEARCH_ENABLED or _default_index is None or not _default_index.searches:
+        return None
+    stats = _default_index.stats()
+    return (
+        f"📚 Local search: {stats['hits']} of {stats['searches']} searches answered locally, "
+        f"{stats['documents']} results indexed ({stats['terms']} terms)"
+    )
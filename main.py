@@ -3,6 +3,7 @@ from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from dotenv import load_dotenv
+from model_client import MODEL_STREAM, get_model_client
 import os
 
 load_dotenv()
@@ -14,10 +15,7 @@ load_dotenv()
 #     # api_key="YOUR_API_KEY",
 # )
 
-model_client = OpenAIChatCompletionClient(
-    model="gemini-1.5-flash-8b",
-    api_key=os.getenv("GEMINI_API_KEY"),
-)
+model_client = get_model_client()
 
 
 # Define a simple function tool that the agent can use.
@@ -35,7 +33,7 @@ agent = AssistantAgent(
     tools=[get_weather],
     system_message="You are a helpful assistant.",
     reflect_on_tool_use=True,
-    model_client_stream=True,  # Enable streaming tokens from the model client.
+    model_client_stream=MODEL_STREAM,  # Stream tokens from the model client (MODEL_STREAM).
 )
 
 
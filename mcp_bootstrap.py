@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from autogen_ext.tools.mcp import (
+    StreamableHttpMcpToolAdapter,
+    StreamableHttpServerParams,
+)
+from dotenv import load_dotenv
+from mcp import Tool
+from schema_cache import SchemaCachedToolAdapter, get_tool_adapter, load_cached_tool
+
+load_dotenv()
+
+# Bootstrap configuration
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "15.0"))  # Per-server discovery timeout in seconds
+MCP_LAZY_CONNECT = os.getenv("MCP_LAZY_CONNECT", "false").lower() in ("1", "true", "yes")
+
+# Schemas of the Smithery tools we use, so lazy adapters can be registered
+# before any connection to the server is made.
+KNOWN_TOOL_SCHEMAS = {
+    "search": Tool(
+        name="search",
+        description="Search DuckDuckGo and return formatted results.",
+        inputSchema={
+            "type": "object",
+            "title": "searchArguments",
+            "properties": {
+                "query": {"title": "Query", "type": "string"},
+                "max_results": {"title": "Max Results", "type": "integer", "default": 10},
+            },
+            "required": ["query"],
+        },
+    ),
+    "generateImageUrl": Tool(
+        name="generateImageUrl",
+        description="Generate an image URL from a text prompt",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "prompt": {"type": "string", "description": "The text description of the image to generate"},
+                "model": {"type": "string", "description": "Model name to use for generation", "default": "flux"},
+                "seed": {"type": "number", "description": "Seed for reproducible results"},
+                "width": {"type": "number", "description": "Width of the generated image", "default": 1024},
+                "height": {"type": "number", "description": "Height of the generated image", "default": 1024},
+                "enhance": {"type": "boolean", "description": "Whether to enhance the prompt using an LLM", "default": True},
+                "safe": {"type": "boolean", "description": "Whether to apply content filtering", "default": False},
+            },
+            "required": ["prompt"],
+        },
+    ),
+}
+
+
+def make_server_params(url: str) -> StreamableHttpServerParams:
+    """Create the streamable HTTP server params shared by all agents"""
+    return StreamableHttpServerParams(
+        url=url,
+        headers={},
+        timeout=30.0,  # HTTP timeout in seconds
+        sse_read_timeout=300.0,  # SSE read timeout in seconds (5 minutes)
+        terminate_on_close=True,
+    )
+
+
+async def connect_tool(
+    url: str,
+    tool_name: str,
+    lazy: bool = MCP_LAZY_CONNECT,
+    timeout: float = MCP_CONNECT_TIMEOUT,
+) -> StreamableHttpMcpToolAdapter:
+    """Create an adapter for one MCP tool.
+
+    In lazy mode the adapter is built from the cached (or known) schema without
+    touching the network; the adapter opens its session the first time the tool
+    is called. Otherwise the schema cache is consulted and the server is only
+    contacted on a miss, bounded by `timeout`.
+    """
+    server_params = make_server_params(url)
+
+    if lazy:
+        tool = await asyncio.to_thread(load_cached_tool, url, tool_name) or KNOWN_TOOL_SCHEMAS.get(tool_name)
+        if tool is not None:
+            return SchemaCachedToolAdapter(server_params=server_params, tool=tool)
+
+    return await asyncio.wait_for(get_tool_adapter(server_params, tool_name), timeout=timeout)
+
+
+async def bootstrap_tools(
+    servers: list[tuple[str, str, str]],
+    lazy: bool = MCP_LAZY_CONNECT,
+    timeout: float = MCP_CONNECT_TIMEOUT,
+) -> dict[str, Optional[StreamableHttpMcpToolAdapter]]:
+    """Connect to several MCP servers concurrently.
+
+    Args:
+        servers: (label, url, tool_name) for each tool to set up.
+
+    Returns:
+        A mapping of label to adapter, or None for servers that failed or timed out.
+    """
+    start = time.perf_counter()
+
+    async def setup(label: str, url: str, tool_name: str):
+        tool_start = time.perf_counter()
+        try:
+            adapter = await connect_tool(url, tool_name, lazy=lazy, timeout=timeout)
+            elapsed = time.perf_counter() - tool_start
+            mode = " (lazy)" if lazy and tool_name in KNOWN_TOOL_SCHEMAS else ""
+            print(f"✅ {label} tool ready{mode} in {elapsed:.2f}s")
+            return adapter
+        except asyncio.TimeoutError:
+            print(f"⚠️ {label} tool timed out after {timeout:.1f}s")
+        except Exception as e:
+            elapsed = time.perf_counter() - tool_start
+            print(f"⚠️ {label} tool failed after {elapsed:.2f}s: {e}")
+        return None
+
+    print(f"🔧 Setting up {len(servers)} MCP tool(s) in parallel...")
+    adapters = await asyncio.gather(*(setup(label, url, tool_name) for label, url, tool_name in servers))
+    print(f"⏱️ Tool startup finished in {time.perf_counter() - start:.2f}s")
+
+    return {label: adapter for (label, _, _), adapter in zip(servers, adapters)}
@@ -0,0 +1,236 @@
+import asyncio
+import contextlib
+import os
+import time
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+from autogen_ext.tools.mcp import StreamableHttpServerParams, create_mcp_server_session
+from dotenv import load_dotenv
+from mcp import ClientSession
+
+load_dotenv()
+
+# MCP session pool configuration
+MCP_POOL_ENABLED = os.getenv("MCP_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))  # Sessions kept open per server
+MCP_POOL_KEEPALIVE = float(os.getenv("MCP_POOL_KEEPALIVE", "30"))  # Seconds between pings of idle sessions
+MCP_POOL_TIMEOUT = float(os.getenv("MCP_POOL_TIMEOUT", "15"))  # Seconds to connect or answer a ping
+
+
+def _label(url: str) -> str:
+    """Server URL without the query string (which holds the API key), for messages"""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+class PooledSession:
+    """One initialized MCP session, held open by its own task.
+
+    The streamable-HTTP transport must be entered and exited in the same
+    task, so a holder task owns it while any task can send requests through
+    `session`; the holder closes it when asked or when the transport fails.
+    """
+
+    def __init__(self, server_params: StreamableHttpServerParams):
+        self.server_params = server_params
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self._stop: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def open(self, timeout: float = MCP_POOL_TIMEOUT) -> ClientSession:
+        ready = asyncio.get_running_loop().create_future()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._hold(ready, self._stop))
+        try:
+            return await asyncio.wait_for(asyncio.shield(ready), timeout=timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _hold(self, ready: asyncio.Future, stop: asyncio.Event):
+        try:
+            async with create_mcp_server_session(self.server_params) as session:
+                await session.initialize()
+                self.session = session
+                ready.set_result(session)
+                await stop.wait()
+        except asyncio.CancelledError:
+            if not ready.done():
+                ready.cancel()
+            raise
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self.session = None
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        task, self._task = self._task, None
+        try:
+            await asyncio.wait_for(task, timeout=MCP_POOL_TIMEOUT)
+        except (asyncio.TimeoutError, Exception):
+            pass
+
+
+class McpSessionPool:
+    """Warm, initialized MCP sessions for one server, shared by every tool call in the process.
+
+    Up to `size` sessions are opened (each multiplexes concurrent requests);
+    a call takes the least busy one, so the per-call cost is a single
+    request instead of a connect and `initialize` handshake. Idle sessions are
+    pinged every `keepalive` seconds, and a session whose ping or call fails
+    is reconnected in the background; a session that died is reopened
+    transparently on its next use.
+    """
+
+    def __init__(
+        self,
+        server_params: StreamableHttpServerParams,
+        size: int = MCP_POOL_SIZE,
+        keepalive: float = MCP_POOL_KEEPALIVE,
+    ):
+        self.server_params = server_params
+        self.keepalive = keepalive
+        self.slots = [PooledSession(server_params) for _ in range(max(1, size))]
+        self.loop = asyncio.get_running_loop()
+        self.connects = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self._connecting: dict[PooledSession, asyncio.Task] = {}
+        self._background: set[asyncio.Task] = set()
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _ensure(self, slot: PooledSession) -> ClientSession:
+        """The slot's session, connecting it once even when several callers need it at the same time"""
+        if slot.alive:
+            return slot.session
+        task = self._connecting.get(slot)
+        if task is None:
+            task = asyncio.create_task(self._connect(slot))
+            self._connecting[slot] = task
+            task.add_done_callback(lambda t, slot=slot: self._connecting.pop(slot, None))
+        return await asyncio.shield(task)
+
+    async def _connect(self, slot: PooledSession) -> ClientSession:
+        reconnect = slot._task is not None
+        await slot.close()
+        session = await slot.open()
+        self.connects += 1
+        if reconnect:
+            self.reconnects += 1
+        return session
+
+    async def prewarm(self):
+        """Open every session now instead of on first use; failures are left for later calls to retry"""
+        self._start_keepalive()
+        results = await asyncio.gather(*(self._ensure(slot) for slot in self.slots), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            print(f"⚠️ MCP pool for {_label(self.server_params.url)}: {len(errors)} session(s) failed to open: {errors[0]}")
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator[ClientSession]:
+        """Borrow an initialized session for one call"""
+        self._start_keepalive()
+        # Idle live sessions first, then idle slots still to connect, then the least busy
+        slot = min(self.slots, key=lambda s: (s.in_flight, not s.alive))
+        if slot.alive:
+            self.reuses += 1
+        session = await self._ensure(slot)
+        slot.in_flight += 1
+        try:
+            yield session
+        except Exception:
+            # The error may be the tool's own; only a failed ping makes the session reconnect
+            self._spawn(self._check(slot))
+            raise
+        finally:
+            slot.in_flight -= 1
+            slot.last_used = time.monotonic()
+
+    async def _check(self, slot: PooledSession):
+        """Ping a session and reconnect it if it does not answer"""
+        if slot.alive:
+            try:
+                await asyncio.wait_for(slot.session.send_ping(), timeout=MCP_POOL_TIMEOUT)
+                return
+            except Exception:
+                pass
+        if slot in self._connecting:
+            return
+        try:
+            await self._ensure(slot)
+        except Exception as e:
+            print(f"⚠️ MCP session to {_label(self.server_params.url)} could not reconnect: {e}")
+
+    def _start_keepalive(self):
+        if self.keepalive > 0 and (self._keepalive_task is None or self._keepalive_task.done()):
+            self._keepalive_task = asyncio.create_task(self._keep_alive())
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(self.keepalive)
+            await asyncio.gather(
+                *(self._check(slot) for slot in self.slots if slot._task is not None and slot.in_flight == 0),
+                return_exceptions=True,
+            )
+
+    async def close(self):
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+        for task in list(self._background) + list(self._connecting.values()):
+            task.cancel()
+        await asyncio.gather(*(slot.close() for slot in self.slots), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "live": sum(slot.alive for slot in self.slots),
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "reuses": self.reuses,
+        }
+
+
+_pools: dict[str, McpSessionPool] = {}
+
+
+def get_mcp_pool(server_params: StreamableHttpServerParams) -> McpSessionPool:
+    """Return the process-wide session pool for a server URL"""
+    pool = _pools.get(server_params.url)
+    if pool is None or pool.loop is not asyncio.get_running_loop():
+        # A pool from another (finished) loop cannot be reused
+        pool = McpSessionPool(server_params)
+        _pools[server_params.url] = pool
+    return pool
+
+
+def prewarm_in_background(server_params: StreamableHttpServerParams) -> Optional[asyncio.Task]:
+    """Start opening a server's pooled sessions without blocking the caller"""
+    if not MCP_POOL_ENABLED:
+        return None
+    pool = get_mcp_pool(server_params)
+    return pool._spawn(pool.prewarm())
+
+
+async def close_mcp_pools():
+    """Close every pooled MCP session of this event loop"""
+    loop = asyncio.get_running_loop()
+    pools = [pool for pool in _pools.values() if pool.loop is loop]
+    _pools.clear()
+    await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
@@ -0,0 +1,392 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncGenerator, Literal, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from autogen_core.tools import Tool, ToolSchema
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from dotenv import load_dotenv
+from opentelemetry.trace import Status, StatusCode
+from pydantic import BaseModel
+
+from context_budget import count_tokens, message_tokens
+from completion_cache import COMPLETION_CACHE_ENABLED, SAMPLING_PARAMS, CachingChatCompletionClient
+from tracing import tracer
+
+load_dotenv()
+
+MODEL_NAME = os.getenv("MODEL_NAME", "gemini-1.5-flash-8b")
+MODEL_BASE_URL = os.getenv("MODEL_BASE_URL")  # Override the endpoint, e.g. a local stub server
+MODEL_STREAM = os.getenv("MODEL_STREAM", "true").lower() == "true"  # Stream tokens in every agent
+MODEL_TEMPERATURE = os.getenv("MODEL_TEMPERATURE", "")  # Empty keeps the provider default; 0 makes answers cacheable
+
+# Rate limit configuration (0 disables a limit)
+MODEL_RPM = float(os.getenv("MODEL_RPM", "60"))  # Requests per minute
+MODEL_TPM = float(os.getenv("MODEL_TPM", "1000000"))  # Prompt + completion tokens per minute
+MODEL_MIN_CONCURRENCY = int(os.getenv("MODEL_MIN_CONCURRENCY", "1"))
+MODEL_INITIAL_CONCURRENCY = int(os.getenv("MODEL_INITIAL_CONCURRENCY", "4"))
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "16"))
+MODEL_LATENCY_TARGET = float(os.getenv("MODEL_LATENCY_TARGET", "10.0"))  # Seconds before latency counts as congestion
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "3"))  # Retries after a 429
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` tokens are available and take them (callers are served in order)"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) tokens after the fact; the balance may go negative"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server signalled a rate limit"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: +1 per window of successes, halved on throttling.
+
+    Calls slower than `latency_target` shrink the limit gently, so queueing at
+    the server is detected before it turns into 429s.
+    """
+
+    def __init__(
+        self,
+        initial: int = MODEL_INITIAL_CONCURRENCY,
+        minimum: int = MODEL_MIN_CONCURRENCY,
+        maximum: int = MODEL_MAX_CONCURRENCY,
+        latency_target: float = MODEL_LATENCY_TARGET,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float):
+        if latency > self.latency_target:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after(error: Exception, attempt: int) -> float:
+    """Delay before retrying a 429: the server's Retry-After if present, else exponential backoff"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return min(60.0, 2.0 ** attempt)
+
+
+class RateLimitedChatCompletionClient(ChatCompletionClient):
+    """Model client wrapper with request/token buckets and AIMD adaptive concurrency.
+
+    One instance is meant to be shared by every agent in the process so that all
+    model calls draw from the same budget.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        requests_per_minute: float = MODEL_RPM,
+        tokens_per_minute: float = MODEL_TPM,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        max_retries: int = MODEL_MAX_RETRIES,
+    ):
+        self._client = client
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_retries = max_retries
+        self.throttled = 0
+
+    def estimate_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        """Estimate prompt tokens of the messages and tool schemas.
+
+        Uses the process-wide tiktoken encoding of context_budget (~4 characters
+        per token offline) rather than the wrapped client's count_tokens, whose
+        per-call model lookup warns on every request for non-OpenAI models.
+        """
+        tokens = sum(message_tokens(message) for message in messages)
+        for tool in tools:
+            schema = tool.schema if isinstance(tool, Tool) else tool
+            tokens += count_tokens(json.dumps(schema, default=str))
+        return tokens
+
+    async def _acquire(self, prompt_tokens: int):
+        if self.request_bucket is not None:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket is not None:
+            await self.token_bucket.acquire(prompt_tokens)
+        await self.concurrency.acquire()
+
+    async def _admit(self, prompt_tokens: int, cancellation_token: Optional[CancellationToken] = None):
+        """Wait for rate limit and concurrency budget; a cancelled token stops the wait"""
+        admission = asyncio.ensure_future(self._acquire(prompt_tokens))
+        if cancellation_token is not None:
+            cancellation_token.link_future(admission)
+        try:
+            await admission
+        except asyncio.CancelledError:
+            # A slot granted just as the wait was cancelled must be given back
+            if admission.done() and not admission.cancelled():
+                await self.concurrency.release()
+            raise
+
+    def _settle(self, prompt_tokens: int, result: CreateResult, latency: float):
+        self.concurrency.on_success(latency)
+        if self.token_bucket is not None and result.usage is not None:
+            # Charge what the call really cost compared to the estimate
+            actual = result.usage.prompt_tokens + result.usage.completion_tokens
+            self.token_bucket.adjust(actual - prompt_tokens)
+
+    def _record_throughput(self, span, result: CreateResult, generation_time: float):
+        """Attach completion tokens and tokens/s (after the first chunk) to a stream's span"""
+        completion_tokens = result.usage.completion_tokens if result.usage is not None else 0
+        if not completion_tokens:
+            completion_tokens = len(str(result.content)) // 4 + 1
+        span.set_attributes({
+            "model.completion_tokens": completion_tokens,
+            "model.generation_ms": generation_time * 1000,
+            "model.tps": completion_tokens / generation_time if generation_time > 0 else 0.0,
+        })
+
+    def _throttle(self):
+        self.throttled += 1
+        self.concurrency.on_throttle()
+        if self.request_bucket is not None:
+            self.request_bucket.drain()
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        prompt_tokens = self.estimate_tokens(messages, tools)
+        with tracer.start_as_current_span(
+            "model.create", attributes={"model.name": MODEL_NAME, "model.prompt_tokens_estimate": prompt_tokens}
+        ) as span:
+            queued = 0.0
+            for attempt in range(self.max_retries + 1):
+                admit_start = time.monotonic()
+                await self._admit(prompt_tokens, cancellation_token)
+                start = time.monotonic()
+                queued += start - admit_start
+                try:
+                    result = await self._client.create(
+                        messages,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    )
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == self.max_retries:
+                        raise
+                    self._throttle()
+                    await asyncio.sleep(retry_after(e, attempt))
+                    continue
+                finally:
+                    await self.concurrency.release()
+                latency = time.monotonic() - start
+                self._settle(prompt_tokens, result, latency)
+                # Without streaming the first token arrives with the whole response
+                span.set_attributes({
+                    "model.queue_ms": queued * 1000,
+                    "model.ttft_ms": latency * 1000,
+                    "model.attempts": attempt + 1,
+                })
+                return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        prompt_tokens = self.estimate_tokens(messages, tools)
+        # Ask for usage in the final chunk so tokens/s and the token budget use real counts
+        stream_options = dict(extra_create_args.get("stream_options") or {})
+        stream_options.setdefault("include_usage", True)
+        extra_create_args = {**extra_create_args, "stream_options": stream_options}
+        # Not made current: the span would otherwise stay attached across yields to the caller
+        span = tracer.start_span(
+            "model.stream", attributes={"model.name": MODEL_NAME, "model.prompt_tokens_estimate": prompt_tokens}
+        )
+        queued = 0.0
+        try:
+            for attempt in range(self.max_retries + 1):
+                admit_start = time.monotonic()
+                await self._admit(prompt_tokens, cancellation_token)
+                start = time.monotonic()
+                queued += start - admit_start
+                first_chunk_latency = None
+                try:
+                    async for chunk in self._client.create_stream(
+                        messages,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    ):
+                        if first_chunk_latency is None:
+                            first_chunk_latency = time.monotonic() - start
+                            span.set_attribute("model.ttft_ms", first_chunk_latency * 1000)
+                        if isinstance(chunk, CreateResult):
+                            # Time to first chunk is the congestion signal for streams
+                            self._settle(prompt_tokens, chunk, first_chunk_latency)
+                            self._record_throughput(span, chunk, time.monotonic() - start - first_chunk_latency)
+                        yield chunk
+                    span.set_attributes({"model.queue_ms": queued * 1000, "model.attempts": attempt + 1})
+                    return
+                except Exception as e:
+                    # Only retry if nothing was streamed to the caller yet
+                    if not is_rate_limit_error(e) or first_chunk_latency is not None or attempt == self.max_retries:
+                        raise
+                    self._throttle()
+                    await asyncio.sleep(retry_after(e, attempt))
+                finally:
+                    await self.concurrency.release()
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            span.end()
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self):  # type: ignore
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "throttled": self.throttled,
+        }
+
+
+_shared_client: Optional[ChatCompletionClient] = None
+
+
+def create_model_client(budget_share: float = 1.0, **kwargs) -> ChatCompletionClient:
+    """Create a new rate-limited Gemini client.
+
+    `budget_share` scales the request and token limits, for processes that
+    split one account's quota between them. Retries inside the OpenAI SDK are
+    disabled so that 429s reach the limiter instead of being retried blindly.
+    With COMPLETION_CACHE_ENABLED, repeated deterministic requests are
+    answered from the completion cache in front of the limiter.
+    """
+    if MODEL_BASE_URL:
+        kwargs.setdefault("base_url", MODEL_BASE_URL)
+    if MODEL_TEMPERATURE:
+        kwargs.setdefault("temperature", float(MODEL_TEMPERATURE))
+    client = OpenAIChatCompletionClient(
+        model=MODEL_NAME,
+        api_key=os.getenv("GEMINI_API_KEY"),
+        max_retries=0,
+        **kwargs,
+    )
+    client = RateLimitedChatCompletionClient(
+        client,
+        requests_per_minute=MODEL_RPM * budget_share,
+        tokens_per_minute=MODEL_TPM * budget_share,
+    )
+    if COMPLETION_CACHE_ENABLED:
+        sampling = {name: kwargs[name] for name in SAMPLING_PARAMS if name in kwargs}
+        client = CachingChatCompletionClient(client, MODEL_NAME, sampling)
+    return client
+
+
+def get_model_client() -> ChatCompletionClient:
+    """Return the process-wide rate-limited model client"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = create_model_client()
+    return _shared_client
+
+
+async def close_model_client():
+    """Close the process-wide model client, if it was created"""
+    global _shared_client
+    if _shared_client is not None:
+        client, _shared_client = _shared_client, None
+        await client.close()
@@ -11,6 +11,24 @@ import os
 from dotenv import load_dotenv
 from urllib.parse import urlencode
 from autogen_agentchat.teams import RoundRobinGroupChat
+from autogen_agentchat.conditions import TextMessageTermination
+from mcp_bootstrap import bootstrap_tools, connect_tool, make_server_params
+from model_client import MODEL_STREAM, close_model_client, get_model_client
+from context_budget import create_model_context
+from search_cache import cache_key, close_search_caches, format_cache_stats, with_search_cache
+from single_flight import with_single_flight
+from resilience import format_latency_stats, with_resilience
+from result_compaction import format_compaction_stats, with_compaction
+from completion_cache import format_completion_cache_stats
+from local_index import format_local_index_stats, local_search_hint, local_search_tools, with_local_index
+from circuit_breaker import BREAKER_ENABLED, find_breaker, healthy_tools, mcp_probe, with_breaker
+from image_cache import with_image_cache
+from async_console import REPL_CONCURRENCY, run_repl
+from deadline import QueryCancellation, report_outcome, run_with_deadline
+from fast_path import format_fast_path_stats, try_fast_path
+from event_sink import close_event_sink
+from mcp_pool import close_mcp_pools
+from tracing import query_span, setup_tracing, traced_stream
 
 load_dotenv()
 
@@ -27,45 +45,44 @@ IMAGE_URL = f"{IMAGE_BASE_URL}?{urlencode(IMAGE_PARAMS)}"
 
 
 async def setup_mcp_tools():
-    """Setup MCP tools: search (and image generation if compatible)"""
+    """Setup MCP tools: search (and image generation if compatible).
+
+    Each tool sits behind a circuit breaker that fails fast while its server
+    is unhealthy and probes it in the background. An image server that is
+    down at startup is registered from its known schema with the circuit
+    open, so it is offered to the agent as soon as it comes up.
+    """
     tools = []
 
     try:
-        # Setup Search Tool
-        print("🔧 Setting up DuckDuckGo search tool...")
-        search_server_params = StreamableHttpServerParams(
-            url=SEARCH_URL,
-            headers={},
-            timeout=30.0,
-            sse_read_timeout=300.0,
-            terminate_on_close=True,
-        )
-
-        search_adapter = await StreamableHttpMcpToolAdapter.from_server_params(
-            search_server_params, "search"
-        )
-        tools.append(search_adapter)
-        print("✅ Search tool connected!")
-
-        # Setup Image Generation Tool with proper schema
-        print("🔧 Setting up Flux image generation tool...")
-        try:
-            image_server_params = StreamableHttpServerParams(
-                url=IMAGE_URL,
-                headers={},
-                timeout=30.0,
-                sse_read_timeout=300.0,
-                terminate_on_close=True,
-            )
+        # Discover both servers concurrently so the slowest one bounds startup
+        adapters = await bootstrap_tools([
+            ("Search", SEARCH_URL, "search"),
+            ("Image generation", IMAGE_URL, "generateImageUrl"),
+        ])
 
-            image_adapter = await StreamableHttpMcpToolAdapter.from_server_params(
-                image_server_params, "generateImageUrl"
-            )
-            tools.append(image_adapter)
-            print("✅ Image generation tool connected!")
+        if adapters["Search"] is None:
+            print("❌ Error setting up MCP tools: search tool unavailable")
+            return []
+        search = with_resilience(adapters["Search"], idempotent=True)
+        search = with_breaker(search, mcp_probe(make_server_params(SEARCH_URL)))
+        # Index only results fetched from the server, not search cache hits
+        search = with_local_index(search)
+        tools.append(with_compaction(with_search_cache(with_single_flight(search, key_fn=cache_key))))
+        tools.extend(with_compaction(tool) for tool in local_search_tools())
 
-        except Exception as e:
-            print(f"⚠️ Image generation tool failed: {e}")
+        image_adapter = adapters["Image generation"]
+        image_down = image_adapter is None and BREAKER_ENABLED
+        if image_down:
+            image_adapter = await connect_tool(IMAGE_URL, "generateImageUrl", lazy=True)
+        if image_adapter is not None:
+            # Every generation costs a remote render: measured, but never hedged or retried
+            image = with_resilience(image_adapter, idempotent=False)
+            image = with_breaker(image, mcp_probe(make_server_params(IMAGE_URL)))
+            if image_down:
+                find_breaker(image).trip("server unavailable at startup")
+            tools.append(with_compaction(with_image_cache(with_single_flight(image))))
+        else:
             print("   Continuing with search tool only...")
 
         return tools
@@ -75,27 +92,15 @@ async def setup_mcp_tools():
         return []
 
 
-async def main() -> None:
-    """Main function to run the multi-tool AutoGen agent"""
-    
-    # Setup MCP tools
-    tools = await setup_mcp_tools()
-    
-    if not tools:
-        print("❌ Failed to setup MCP tools. Exiting.")
-        return
-    
-    # Create model client
-    model_client = OpenAIChatCompletionClient(
-        model="gemini-1.5-flash-8b",
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
-    print("✅ Model client created!")
+def available_tools(tools) -> tuple[bool, bool]:
+    """Return (has_search, has_image) for a list of tools"""
+    has_search = any(tool.name == "search" for tool in tools)
+    has_image = any("generate" in tool.name.lower() for tool in tools)
+    return has_search, has_image
 
-    # Determine available tools for system message
-    has_search = any("search" in str(tool) for tool in tools)
-    has_image = any("generate" in str(tool).lower() for tool in tools)
 
+def build_system_message(has_search: bool, has_image: bool) -> str:
+    """Create the system message describing the available tools"""
     # Create dynamic system message based on available tools
     system_message = "You are a helpful AI assistant with access to the following tools:\n\n"
 
@@ -126,19 +131,68 @@ async def main() -> None:
 
     system_message += "\n- If unclear, ask the user to clarify what they want\n- Always be helpful and choose the most appropriate tool based on the user's request"
 
-    # Create multi-tool agent
-    multi_agent = AssistantAgent(
+    return system_message
+
+
+def create_agent(model_client, tools) -> AssistantAgent:
+    """Create the multi-tool agent for the given tools"""
+    return AssistantAgent(
         name="multi_tool_agent",
         model_client=model_client,
         tools=tools,
-        system_message=system_message,
+        system_message=build_system_message(*available_tools(tools)) + local_search_hint(tools),
+        model_client_stream=MODEL_STREAM,
+        model_context=create_model_context(model_client),
     )
+
+
+def create_team(model_client, tools, multi_agent: AssistantAgent = None) -> RoundRobinGroupChat:
+    """Create a team with its own conversation state; a new agent is made if none is given.
+
+    A turn ends at the agent's first text answer; max_turns only caps tool-call rounds.
+    """
+    return RoundRobinGroupChat(
+        [multi_agent or create_agent(model_client, tools)],
+        termination_condition=TextMessageTermination("multi_tool_agent"),
+        max_turns=5,
+    )
+
+
+async def rebuild_team(model_client, tools, team: RoundRobinGroupChat) -> RoundRobinGroupChat:
+    """Create a team for a new set of tools that continues the conversation of `team`"""
+    state = await team.save_state()
+    new_team = create_team(model_client, tools)
+    await new_team.load_state(state)
+    return new_team
+
+
+async def main() -> None:
+    """Main function to run the multi-tool AutoGen agent"""
+    setup_tracing()
+    
+    # Setup MCP tools
+    tools = await setup_mcp_tools()
+    
+    if not tools:
+        print("❌ Failed to setup MCP tools. Exiting.")
+        return
+    
+    # Create model client (shared and rate limited)
+    model_client = get_model_client()
+    print("✅ Model client created!")
+
+    # Offer only the tools whose servers are up; the set is re-checked before every query
+    active_tools = healthy_tools(tools)
+    has_search, has_image = available_tools(active_tools)
+
+    # Create multi-tool agent
+    multi_agent = create_agent(model_client, active_tools)
     
     # Create user proxy agent
     user_proxy = UserProxyAgent(name="user_proxy")
     
     # Create team
-    team = RoundRobinGroupChat([multi_agent], max_turns=5)
+    team = create_team(model_client, active_tools, multi_agent)
 
     print(f"\n🤖 Multi-Tool AutoGen Agent (Gemini) is ready! ({len(tools)} tools loaded)")
     print("I can help you with:")
@@ -147,8 +201,8 @@ async def main() -> None:
     if has_image:
         print("  🎨 Image generation from text descriptions")
     if not has_image:
-        print("  ⚠️  Image generation currently unavailable (schema compatibility issue)")
-    print("Type 'exit' to quit.\n")
+        print("  ⚠️  Image generation currently unavailable (enabled automatically if its server recovers)")
+    print("Type 'exit' to quit or 'cancel' (Ctrl-C) to stop the current answer.\n")
 
     # Show example queries based on available tools
     print("💡 Example queries you can try:")
@@ -169,34 +223,63 @@ async def main() -> None:
         print("    • Photography and design inspiration")
     print()
 
-    # Interactive loop
-    while True:
-        try:
-            # Get user input
-            user_query = input("You: ").strip()
-            
-            if user_query.lower() in ['exit', 'quit', 'bye']:
-                print("👋 Goodbye!")
-                break
-                
-            if not user_query:
-                print("Please enter a valid query.")
-                continue
-            
-            print(f"\n🤖 Processing: {user_query}")
-            print("-" * 50)
-            
-            # Run the conversation
-            stream = team.run_stream(task=user_query)
-            await Console(stream)
-            print("\n" + "="*60 + "\n")
-            
-        except KeyboardInterrupt:
-            print("\n👋 Goodbye!")
-            break
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            print("Please try again.\n")
+    # Interactive loop: the next question can be typed while an answer is streaming
+    async def handle(user_query: str, render, cancellation: QueryCancellation):
+        nonlocal team, active_tools
+        print(f"\n🤖 Processing: {user_query}")
+        print("-" * 50)
+
+        # Tools went down or recovered since the last query: advertise the new set
+        shared = REPL_CONCURRENCY <= 1
+        current_tools = healthy_tools(tools)
+        if [tool.name for tool in current_tools] != [tool.name for tool in active_tools]:
+            active_tools = current_tools
+            names = ", ".join(tool.name for tool in active_tools) or "none"
+            print(f"🔄 Available tools changed: {names}")
+            if shared:
+                team = await rebuild_team(model_client, active_tools, team)
+
+        # Run the conversation, traced per phase and bounded by the query deadline;
+        # queries answered side by side each get their own conversation
+        query_tools = active_tools
+        with query_span(user_query):
+            # Obvious intents run their tool directly instead of waiting for the model to pick it
+            route = await try_fast_path(user_query, active_tools, cancellation)
+            if route is not None and route.verbatim:
+                print(route.result)
+                print("\n" + "="*60 + "\n")
+                return
+            outcome = await run_with_deadline(
+                team if shared else create_team(model_client, query_tools),
+                route.task(user_query) if route is not None else user_query,
+                render=lambda stream: render(traced_stream(stream)),
+                cancellation=cancellation,
+                create_team=(lambda: create_team(model_client, query_tools)) if shared else None,
+            )
+        if outcome.team is not None:
+            # A cancelled team cannot run again; continue from the state before this query
+            team = outcome.team
+        report_outcome(outcome, cancellation)
+        print("\n" + "="*60 + "\n")
+
+    await run_repl(handle)
+    for stats in (
+        format_cache_stats(tools[0]),
+        format_latency_stats(tools),
+        format_compaction_stats(tools),
+        format_fast_path_stats(),
+        format_completion_cache_stats(model_client),
+        format_local_index_stats(),
+    ):
+        if stats:
+            print(stats)
+    print("👋 Goodbye!")
+
+    # Flush recorded events, close pooled MCP sessions and the caches' SQLite connections
+    await close_event_sink()
+    await close_mcp_pools()
+    await close_model_client()
+    close_search_caches()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from typing import Any, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from search_cache import normalize_query
+from tool_wrappers import DelegatingTool
+from tracing import tracer
+
+load_dotenv()
+
+# Speculative search configuration
+SEARCH_PREFETCH = os.getenv("SEARCH_PREFETCH", "false").lower() in ("1", "true", "yes")
+SEARCH_PREFETCH_MATCH = float(os.getenv("SEARCH_PREFETCH_MATCH", "0.7"))  # Word overlap that counts as the same search
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the words of two queries (1.0 for the same normalized query)"""
+    words_a = set(normalize_query(a).strip("?!. ").split())
+    words_b = set(normalize_query(b).strip("?!. ").split())
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class Prefetch:
+    """A search started on the raw user query before the model asked for it"""
+
+    def __init__(self, args: BaseModel, task: asyncio.Task, token: CancellationToken, scope: CancellationToken):
+        self.args = args
+        self.task = task
+        self.token = token
+        self.scope = scope  # The query's cancellation token, which its tool calls receive
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.used = False
+        self.missed = False  # The model searched for something else
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task):
+        self.finished = time.monotonic()
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case nobody asks for the result
+
+    @property
+    def query(self) -> str:
+        return self.args.query
+
+
+class SpeculativeSearchTool(DelegatingTool):
+    """Search wrapper that runs the search for the user's question while the model is still deciding.
+
+    `prefetch(query, cancellation_token)` starts the search right away. When
+    the model, answering that query, calls the tool with a query close enough
+    to it (and otherwise the same arguments), the call is served from the
+    in-flight prefetch; otherwise the search runs as usual. Prefetches are
+    keyed by the query's cancellation token, which its tool calls receive, so
+    concurrent queries never use or miss each other's. `finish()` discards a
+    prefetch that was not used. Hits, misses and the search time hidden behind
+    the model call are counted.
+    """
+
+    def __init__(self, inner: BaseTool, min_similarity: float = SEARCH_PREFETCH_MATCH):
+        super().__init__(inner)
+        self.min_similarity = min_similarity
+        self._pending: dict[CancellationToken, Prefetch] = {}
+        self.prefetched = 0
+        self.hits = 0
+        self.misses = 0  # The model searched for something else
+        self.unused = 0  # The model answered without searching
+        self.saved = 0.0
+
+    def prefetch(self, query: str, cancellation_token: CancellationToken) -> Prefetch:
+        args = self.args_type()(query=query)
+        token = CancellationToken()
+
+        async def search():
+            with tracer.start_as_current_span("search.prefetch", attributes={"search.query": query[:200]}):
+                return await self._inner.run(args, token)
+
+        prefetch = Prefetch(args, asyncio.create_task(search()), token, cancellation_token)
+        self._pending[cancellation_token] = prefetch
+        self.prefetched += 1
+        return prefetch
+
+    def finish(self, prefetch: Prefetch):
+        """End of the query: drop the prefetch, cancelling it if the model never used it"""
+        if self._pending.get(prefetch.scope) is prefetch:
+            del self._pending[prefetch.scope]
+        if prefetch.used:
+            return
+        if not prefetch.missed:
+            self.unused += 1
+        prefetch.token.cancel()
+        prefetch.task.cancel()
+
+    def _matches(self, prefetch: Prefetch, args: BaseModel) -> bool:
+        if prefetch.args.model_dump(exclude={"query"}) != args.model_dump(exclude={"query"}):
+            return False
+        return query_similarity(prefetch.query, args.query) >= self.min_similarity
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        prefetch = self._pending.get(cancellation_token)
+        if prefetch is None or prefetch.used:
+            return await self._inner.run(args, cancellation_token)
+        if not self._matches(prefetch, args):
+            if not prefetch.missed:
+                prefetch.missed = True
+                self.misses += 1
+            return await self._inner.run(args, cancellation_token)
+
+        prefetch.used = True
+        requested = time.monotonic()
+        wait = asyncio.ensure_future(asyncio.shield(prefetch.task))
+        cancellation_token.link_future(wait)
+        try:
+            value = await wait
+        except asyncio.CancelledError:
+            if cancellation_token.is_cancelled():
+                raise
+            return await self._inner.run(args, cancellation_token)  # The prefetch was dropped under us
+        except Exception:
+            # The speculative search failed; the model's own call gets a normal attempt
+            return await self._inner.run(args, cancellation_token)
+        saved = min(requested, prefetch.finished or requested) - prefetch.started
+        self.hits += 1
+        self.saved += saved
+        print(f"⚡ Prefetched search hit: {saved:.2f}s of search hidden behind the model call")
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "prefetched": self.prefetched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "unused": self.unused,
+            "hit_rate": self.hits / self.prefetched if self.prefetched else 0.0,
+            "saved": self.saved,
+        }
+
+
+def with_prefetch(tool: BaseTool) -> BaseTool:
+    """Wrap the search tool for speculative prefetching if enabled"""
+    return SpeculativeSearchTool(tool) if SEARCH_PREFETCH else tool
+
+
+def format_prefetch_stats(tool: BaseTool) -> Optional[str]:
+    """One-line summary of a speculative search tool's counters, if it prefetched anything"""
+    if not isinstance(tool, SpeculativeSearchTool) or not tool.prefetched:
+        return None
+    stats = tool.stats()
+    return (
+        f"⚡ Search prefetch: {stats['hits']} hits, {stats['misses']} misses, {stats['unused']} unused, "
+        f"hit rate {stats['hit_rate']:.0%}, {stats['saved']:.2f}s saved"
+    )
@@ -0,0 +1,215 @@
+import asyncio
+import bisect
+import os
+import random
+import time
+from typing import Any, Iterable, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from opentelemetry import trace
+from pydantic import BaseModel
+
+from tool_wrappers import DelegatingTool
+
+load_dotenv()
+
+# Tool resilience configuration
+TOOL_RESILIENCE_ENABLED = os.getenv("TOOL_RESILIENCE_ENABLED", "true").lower() in ("1", "true", "yes")
+TOOL_HEDGE_QUANTILE = float(os.getenv("TOOL_HEDGE_QUANTILE", "0.95"))  # Latency quantile after which a hedge is sent
+TOOL_HEDGE_MIN_DELAY = float(os.getenv("TOOL_HEDGE_MIN_DELAY", "0.05"))  # Never hedge sooner than this (seconds)
+TOOL_HEDGE_MIN_SAMPLES = int(os.getenv("TOOL_HEDGE_MIN_SAMPLES", "20"))  # Calls recorded before hedging starts
+TOOL_HEDGE_BUDGET = float(os.getenv("TOOL_HEDGE_BUDGET", "0.1"))  # Most hedges as a fraction of calls
+TOOL_RETRIES = int(os.getenv("TOOL_RETRIES", "2"))  # Extra attempts after a failure, idempotent tools only
+TOOL_RETRY_BASE_DELAY = float(os.getenv("TOOL_RETRY_BASE_DELAY", "0.25"))  # Backoff cap of the first retry
+TOOL_RETRY_MAX_DELAY = float(os.getenv("TOOL_RETRY_MAX_DELAY", "2.0"))  # Backoff cap of later retries
+
+
+class LatencyHistogram:
+    """Call latencies in log-spaced buckets (about 12% resolution from 1ms to a few minutes).
+
+    Recording and reading a quantile are cheap enough to do on every call.
+    """
+
+    def __init__(self, smallest: float = 0.001, growth: float = 1.25, buckets: int = 56):
+        self.bounds = [smallest * growth**i for i in range(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile `q`, or None before any call was recorded"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        return self.bounds[min(index, len(self.bounds) - 1)]
+
+
+_histograms: dict[str, LatencyHistogram] = {}
+
+
+def latency_histogram(tool_name: str) -> LatencyHistogram:
+    """Process-wide latency histogram of a tool, shared by every wrapper of that tool"""
+    if tool_name not in _histograms:
+        _histograms[tool_name] = LatencyHistogram()
+    return _histograms[tool_name]
+
+
+class ResilientTool(DelegatingTool):
+    """Tool wrapper that hedges slow calls and retries failed ones.
+
+    Every successful attempt is recorded in the tool's latency histogram.
+    For idempotent tools, once enough calls are recorded, a call still running
+    after the histogram's p95 gets a second (hedged) attempt and the first
+    result wins; hedges are capped at `hedge_budget` of all calls so a slow
+    server never sees double the load. Failed calls of idempotent tools are
+    retried with full-jitter exponential backoff. Tools with side effects are
+    only measured.
+    """
+
+    def __init__(
+        self,
+        inner: BaseTool,
+        idempotent: bool,
+        hedge_quantile: float = TOOL_HEDGE_QUANTILE,
+        hedge_budget: float = TOOL_HEDGE_BUDGET,
+        retries: int = TOOL_RETRIES,
+    ):
+        super().__init__(inner)
+        self.idempotent = idempotent
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.retries = retries if idempotent else 0
+        self.latency = latency_histogram(inner.name)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.retried = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging the next call, or None if it must not be hedged"""
+        if not self.idempotent or self.latency.count < TOOL_HEDGE_MIN_SAMPLES:
+            return None
+        if self.hedged >= self.hedge_budget * self.calls:
+            return None
+        return max(TOOL_HEDGE_MIN_DELAY, self.latency.quantile(self.hedge_quantile))
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._hedged_call(args, cancellation_token)
+            except (ValueError, TypeError):
+                raise  # Bad arguments: another attempt cannot succeed
+            except Exception as e:
+                if attempt == self.retries or cancellation_token.is_cancelled():
+                    raise
+                self.retried += 1
+                trace.get_current_span().add_event("tool.retry", {"attempt": attempt + 1, "error": str(e)[:200]})
+                backoff = asyncio.ensure_future(
+                    asyncio.sleep(random.uniform(0, min(TOOL_RETRY_MAX_DELAY, TOOL_RETRY_BASE_DELAY * 2**attempt)))
+                )
+                cancellation_token.link_future(backoff)
+                await backoff
+
+    async def _hedged_call(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        self.calls += 1
+        attempts: list[tuple[asyncio.Future, CancellationToken]] = []
+
+        def launch() -> asyncio.Future:
+            token = CancellationToken()
+            started = time.monotonic()
+            task = asyncio.ensure_future(self._inner.run(args, token))
+            task.add_done_callback(lambda t: self._record(t, started))
+            attempts.append((task, token))
+            # Cancelling the caller's token cancels the attempt, like the backoff in run()
+            return cancellation_token.link_future(task)
+
+        def stop_all():
+            for task, token in attempts:
+                if not task.done():
+                    token.cancel()
+                    task.cancel()
+
+        try:
+            pending = {launch()}
+            hedge_after = self.hedge_delay()
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than the hedge quantile: race a second attempt against the first
+                    hedge_after = None
+                    self.hedged += 1
+                    trace.get_current_span().add_event("tool.hedge")
+                    pending.add(launch())
+                    continue
+                hedge_after = None  # The first attempt failed early: leave it to the retries
+                for task in done:
+                    if task.exception() is None:
+                        if task is not attempts[0][0]:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            stop_all()
+
+    def _record(self, task: asyncio.Future, started: float):
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self.latency.record(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "p50": self.latency.quantile(0.5),
+            "p95": self.latency.quantile(0.95),
+            "p99": self.latency.quantile(0.99),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "retried": self.retried,
+        }
+
+
+def with_resilience(tool: BaseTool, idempotent: bool) -> BaseTool:
+    """Wrap a tool with hedging and retries (idempotent tools) and latency tracking, if enabled"""
+    return ResilientTool(tool, idempotent) if TOOL_RESILIENCE_ENABLED else tool
+
+
+def find_resilient_tool(tool: BaseTool) -> Optional[ResilientTool]:
+    """The ResilientTool somewhere in a stack of wrappers, if any"""
+    while tool is not None:
+        if isinstance(tool, ResilientTool):
+            return tool
+        tool = getattr(tool, "inner", None)
+    return None
+
+
+def format_latency_stats(tools: Iterable[BaseTool]) -> Optional[str]:
+    """Per-tool latency percentiles and hedge/retry counters, one line per measured tool"""
+    lines = []
+    for tool in tools:
+        resilient = find_resilient_tool(tool)
+        if resilient is None or not resilient.calls:
+            continue
+        stats = resilient.stats()
+        percentiles = " ".join(
+            f"{name} {stats[name]:.2f}s" for name in ("p50", "p95", "p99") if stats[name] is not None
+        )
+        lines.append(
+            f"📈 {resilient.name}: {stats['calls']} calls, {percentiles or 'no successes'}, "
+            f"{stats['hedged']} hedged ({stats['hedge_wins']} won), {stats['retried']} retried"
+        )
+    return "\n".join(lines) or None
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+from urllib.parse import urlsplit
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from mcp.types import TextContent
+from pydantic import BaseModel
+
+from context_budget import count_tokens, truncate_tokens
+from tool_wrappers import DelegatingTool
+from tracing import tracer
+
+load_dotenv()
+
+# Tool result compaction configuration
+TOOL_COMPACTION_ENABLED = os.getenv("TOOL_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+TOOL_COMPACTION_TOP_K = int(os.getenv("TOOL_COMPACTION_TOP_K", "5"))  # Search results passed to the model
+TOOL_COMPACTION_SNIPPET_TOKENS = int(os.getenv("TOOL_COMPACTION_SNIPPET_TOKENS", "80"))  # Cap per result summary
+TOOL_COMPACTION_DUPLICATE = float(os.getenv("TOOL_COMPACTION_DUPLICATE", "0.8"))  # Word overlap of near-duplicates
+
+# One result of the DuckDuckGo server's text format: "1. Title\n   URL: ...\n   Summary: ..."
+_SEARCH_RESULT = re.compile(
+    r"^\s*\d+\.\s+(?P<title>[^\n]+)\n\s*URL:\s*(?P<url>\S+)\s*\n\s*Summary:\s*(?P<summary>.*?)(?=^\s*\d+\.\s|\Z)",
+    re.MULTILINE | re.DOTALL,
+)
+_IMAGE_URL = re.compile(r"(?:\"imageUrl\"\s*:\s*\"|Image URL:\s*)(?P<url>https?://[^\s\"]+)")
+_IMAGE_SIZE = re.compile(r"(?:Size:\s*|\"width\"\s*:\s*)(?P<width>\d+)(?:x|,\s*\"height\"\s*:\s*)(?P<height>\d+)")
+_WORD = re.compile(r"\w+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "of", "on", "or",
+    "that", "the", "this", "to", "was", "what", "when", "where", "which", "who", "why", "with",
+}
+
+
+def terms(text: str) -> list[str]:
+    """Lower-cased words of a text without stopwords, in order and with repeats"""
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def words(text: str) -> set[str]:
+    return set(terms(text))
+
+
+@dataclass
+class SearchHit:
+    rank: int  # Position in the server's answer, from 1
+    title: str
+    url: str
+    summary: str
+
+    @property
+    def url_key(self) -> str:
+        """The URL without scheme, "www." and trailing slash, to spot the same page twice"""
+        parts = urlsplit(self.url)
+        host = parts.netloc.lower().removeprefix("www.")
+        return f"{host}{parts.path.rstrip('/')}{'?' + parts.query if parts.query else ''}"
+
+
+def parse_search_results(text: str) -> list[SearchHit]:
+    """Results of a DuckDuckGo search answer, or an empty list for any other text"""
+    return [
+        SearchHit(rank, match.group("title").strip(), match.group("url"), " ".join(match.group("summary").split()))
+        for rank, match in enumerate(_SEARCH_RESULT.finditer(text), start=1)
+    ]
+
+
+def result_text(value: Any) -> Optional[str]:
+    """Text of a tool result (a string or MCP text content), or None if it holds anything else"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list) and value and all(isinstance(item, TextContent) for item in value):
+        return "\n".join(item.text for item in value)
+    return None
+
+
+class ResultCompactor:
+    """Turns verbose tool output into the smallest text that still answers the model.
+
+    Search results are de-duplicated (same page, or summaries sharing at
+    least `duplicate_threshold` of their words), ranked by how many query
+    terms they contain, cut to the `top_k` best and re-encoded one line per
+    result with the summary capped at `snippet_tokens` tokens. Image results
+    are reduced to the URL and size. Anything else passes through unchanged.
+    """
+
+    def __init__(
+        self,
+        top_k: int = TOOL_COMPACTION_TOP_K,
+        snippet_tokens: int = TOOL_COMPACTION_SNIPPET_TOKENS,
+        duplicate_threshold: float = TOOL_COMPACTION_DUPLICATE,
+    ):
+        self.top_k = top_k
+        self.snippet_tokens = snippet_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.duplicates = 0
+
+    def dedupe(self, hits: list[SearchHit]) -> list[SearchHit]:
+        kept: list[tuple[SearchHit, set[str]]] = []
+        seen_urls = set()
+        for hit in hits:
+            hit_words = words(f"{hit.title} {hit.summary}")
+            near_duplicate = any(
+                len(hit_words & other) / len(hit_words | other) >= self.duplicate_threshold
+                for _, other in kept
+                if hit_words and other
+            )
+            if hit.url_key in seen_urls or near_duplicate:
+                self.duplicates += 1
+                continue
+            seen_urls.add(hit.url_key)
+            kept.append((hit, hit_words))
+        return [hit for hit, _ in kept]
+
+    def rank(self, hits: list[SearchHit], query: str) -> list[SearchHit]:
+        """Most relevant first: share of query terms in the title (counted double) and summary, then server rank"""
+        query_terms = words(query)
+        if not query_terms:
+            return hits
+
+        def relevance(hit: SearchHit) -> float:
+            title, summary = words(hit.title), words(hit.summary)
+            return sum(2.0 * (term in title) + (term in summary) for term in query_terms) / (3.0 * len(query_terms))
+
+        return sorted(hits, key=lambda hit: (-relevance(hit), hit.rank))
+
+    def compact_search(self, hits: list[SearchHit], query: str) -> str:
+        unique = self.dedupe(hits)
+        best = self.rank(unique, query)[: self.top_k]
+        dropped = len(hits) - len(unique)
+        header = f'search "{query}": top {len(best)} of {len(hits)} results'
+        if dropped:
+            header += f", {dropped} duplicates removed"
+        lines = [header]
+        for number, hit in enumerate(best, start=1):
+            lines.append(f"{number}. {hit.title} | {hit.url}")
+            if hit.summary:
+                lines.append(f"   {truncate_tokens(hit.summary, self.snippet_tokens)}")
+        return "\n".join(lines)
+
+    def compact(self, text: str, query: Optional[str] = None) -> str:
+        hits = parse_search_results(text)
+        if hits:
+            return self.compact_search(hits, query or "")
+        image = _IMAGE_URL.search(text)
+        if image:
+            size = _IMAGE_SIZE.search(text)
+            return f"image: {image.group('url')}" + (f" ({size.group('width')}x{size.group('height')})" if size else "")
+        return text
+
+
+class CompactingTool(DelegatingTool):
+    """Tool wrapper that compacts the tool's output before it reaches the model.
+
+    The model gets the compact text; the raw output is recorded as an event
+    on a "tool.compact" span (so it lands in the trace log) and the caches
+    below this wrapper keep storing raw results.
+    """
+
+    def __init__(self, inner: BaseTool, compactor: Optional[ResultCompactor] = None):
+        super().__init__(inner)
+        self.compactor = compactor or ResultCompactor()
+        self.calls = 0
+        self.raw_tokens = 0
+        self.compact_tokens = 0
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        value = await self._inner.run(args, cancellation_token)
+        raw = result_text(value)
+        if raw is None:
+            return value  # Images or other non-text content are left to the wrapped tool
+        with tracer.start_as_current_span("tool.compact", attributes={"tool.name": self.name}) as span:
+            compact = self.compactor.compact(raw, getattr(args, "query", None))
+            raw_tokens, compact_tokens = count_tokens(raw), count_tokens(compact)
+            span.add_event("tool.raw_result", {"content": raw})
+            span.set_attributes({"tool.raw_tokens": raw_tokens, "tool.compact_tokens": compact_tokens})
+        self.calls += 1
+        self.raw_tokens += raw_tokens
+        self.compact_tokens += compact_tokens
+        return compact
+
+    def return_value_as_string(self, value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        return self._inner.return_value_as_string(value)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "raw_tokens": self.raw_tokens,
+            "compact_tokens": self.compact_tokens,
+            "saved": 1 - self.compact_tokens / self.raw_tokens if self.raw_tokens else 0.0,
+            "duplicates": self.compactor.duplicates,
+        }
+
+
+def with_compaction(tool: BaseTool) -> BaseTool:
+    """Wrap a tool so its output is compacted before the model sees it, if enabled"""
+    return CompactingTool(tool) if TOOL_COMPACTION_ENABLED else tool
+
+
+def find_compacting_tool(tool: BaseTool) -> Optional[CompactingTool]:
+    """The CompactingTool somewhere in a stack of wrappers, if any"""
+    while tool is not None:
+        if isinstance(tool, CompactingTool):
+            return tool
+        tool = getattr(tool, "inner", None)
+    return None
+
+
+def format_compaction_stats(tools: Iterable[BaseTool]) -> Optional[str]:
+    """Raw vs. compact token totals, one line per tool whose output was compacted"""
+    lines = []
+    for tool in tools:
+        compacting = find_compacting_tool(tool)
+        if compacting is None or not compacting.calls:
+            continue
+        stats = compacting.stats()
+        lines.append(
+            f"🗜️ {compacting.name}: {stats['calls']} results compacted, {stats['raw_tokens']} → "
+            f"{stats['compact_tokens']} tokens ({stats['saved']:.0%} smaller), {stats['duplicates']} duplicates removed"
+        )
+    return "\n".join(lines) or None
@@ -0,0 +1,208 @@
+import asyncio
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from autogen_core import CancellationToken
+from autogen_ext.tools.mcp import (
+    StreamableHttpMcpToolAdapter,
+    StreamableHttpServerParams,
+    create_mcp_server_session,
+)
+from dotenv import load_dotenv
+from mcp import McpError, Tool
+from mcp.types import INVALID_PARAMS, METHOD_NOT_FOUND
+from pydantic import BaseModel
+
+from mcp_pool import MCP_POOL_ENABLED, get_mcp_pool, prewarm_in_background
+from tracing import tracer
+
+load_dotenv()
+
+# Schema cache configuration
+SCHEMA_CACHE_VERSION = 1  # Bump when the file layout changes; older files are ignored
+SCHEMA_CACHE_PATH = os.path.expanduser(
+    os.getenv("MCP_SCHEMA_CACHE", "~/.cache/autogen_mcp/tool_schemas.json")
+)
+SCHEMA_REVALIDATE = os.getenv("MCP_SCHEMA_REVALIDATE", "true").lower() in ("1", "true", "yes")
+
+# Tool errors that mean the server no longer has the cached tool or rejects its arguments
+_STALE_SCHEMA_ERROR = re.compile(
+    r"unknown tool|tool \S+ not found|not a valid tool|validation error|invalid (?:params|arguments)", re.IGNORECASE
+)
+
+# Serializes read-modify-write of the cache file between the event loop and worker threads
+_cache_lock = threading.Lock()
+
+# Keep references to background revalidation and invalidation tasks so they are not garbage collected
+_background_tasks: set[asyncio.Task] = set()
+
+
+def server_key(url: str) -> str:
+    """Cache key for a server: its URL without the query string (which holds the API key)"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def _read_cache() -> dict:
+    try:
+        with open(SCHEMA_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"version": SCHEMA_CACHE_VERSION, "servers": {}}
+    if data.get("version") != SCHEMA_CACHE_VERSION:
+        return {"version": SCHEMA_CACHE_VERSION, "servers": {}}
+    return data
+
+
+def _write_cache(data: dict):
+    directory = os.path.dirname(SCHEMA_CACHE_PATH)
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp file per write, so concurrent writers never share one
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False) as f:
+        json.dump(data, f, indent=2)
+    os.replace(f.name, SCHEMA_CACHE_PATH)
+
+
+def load_cached_tools(url: str) -> dict[str, Tool]:
+    """Return all cached tool schemas for a server, keyed by tool name"""
+    entry = _read_cache()["servers"].get(server_key(url), {})
+    return {name: Tool.model_validate(tool) for name, tool in entry.get("tools", {}).items()}
+
+
+def load_cached_tool(url: str, tool_name: str) -> Optional[Tool]:
+    """Return the cached schema of one tool, or None on a cache miss"""
+    return load_cached_tools(url).get(tool_name)
+
+
+def store_tools(url: str, tools: list[Tool]) -> bool:
+    """Store the tool schemas of a server. Returns True if they changed."""
+    key = server_key(url)
+    dumped = {tool.name: tool.model_dump(mode="json", exclude_none=True) for tool in tools}
+    with _cache_lock:
+        data = _read_cache()
+        changed = data["servers"].get(key, {}).get("tools") != dumped
+        data["servers"][key] = {"fetched_at": time.time(), "tools": dumped}
+        _write_cache(data)
+    return changed
+
+
+def invalidate(url: str, tool_name: Optional[str] = None):
+    """Drop one tool (or the whole server) from the cache"""
+    key = server_key(url)
+    with _cache_lock:
+        data = _read_cache()
+        if key not in data["servers"]:
+            return
+        if tool_name is None:
+            del data["servers"][key]
+        else:
+            data["servers"][key].get("tools", {}).pop(tool_name, None)
+        _write_cache(data)
+
+
+async def fetch_tools(server_params: StreamableHttpServerParams) -> list[Tool]:
+    """Run initialize + list_tools against the server and refresh the cache"""
+    async with create_mcp_server_session(server_params) as session:
+        await session.initialize()
+        tools_response = await session.list_tools()
+    if await asyncio.to_thread(store_tools, server_params.url, tools_response.tools):
+        print(f"🗂️ Tool schemas updated for {server_key(server_params.url)}")
+    return tools_response.tools
+
+
+async def _revalidate(server_params: StreamableHttpServerParams):
+    try:
+        await fetch_tools(server_params)
+    except Exception as e:
+        print(f"⚠️ Background schema revalidation failed for {server_key(server_params.url)}: {e}")
+
+
+def revalidate_in_background(server_params: StreamableHttpServerParams):
+    """Schedule a list_tools refresh without blocking the caller"""
+    _spawn(_revalidate(server_params))
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def is_stale_schema_error(error: Exception) -> bool:
+    """Whether a failed call suggests the cached schema is out of date (as opposed to a network or server fault)"""
+    if isinstance(error, McpError):
+        return error.error.code in (INVALID_PARAMS, METHOD_NOT_FOUND)
+    return bool(_STALE_SCHEMA_ERROR.search(str(error)))
+
+
+class SchemaCachedToolAdapter(StreamableHttpMcpToolAdapter):
+    """MCP tool adapter built from a cached schema.
+
+    If the server rejects a call as an unknown tool or invalid arguments, the
+    cached schema is stale, so the entry is dropped (off the event loop) and
+    the next launch rediscovers the tool from the server. Network errors,
+    timeouts and other tool failures leave the cache alone.
+    """
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken):
+        # Linking the whole call to the token also abandons a hung connect or initialize
+        call = asyncio.ensure_future(self._run_traced(args.model_dump(exclude_unset=True), cancellation_token))
+        cancellation_token.link_future(call)
+        try:
+            return await call
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_stale_schema_error(e):
+                _spawn(asyncio.to_thread(invalidate, self._server_params.url, self._tool.name))
+            raise
+
+    async def _run_traced(self, kwargs: dict, cancellation_token: CancellationToken):
+        """McpToolAdapter.run with session setup and the tool call traced as separate phases"""
+        attributes = {"mcp.tool": self._tool.name, "mcp.server": server_key(self._server_params.url)}
+        if self._session is not None:
+            with tracer.start_as_current_span("mcp.execute", attributes=attributes):
+                return await self._run(args=kwargs, cancellation_token=cancellation_token, session=self._session)
+
+        async with contextlib.AsyncExitStack() as stack:
+            with tracer.start_as_current_span("mcp.connect", attributes=attributes):
+                if MCP_POOL_ENABLED:
+                    # A warm pooled session: next to nothing to wait for here
+                    session = await stack.enter_async_context(get_mcp_pool(self._server_params).session())
+                else:
+                    session = await stack.enter_async_context(create_mcp_server_session(self._server_params))
+                    await session.initialize()
+            with tracer.start_as_current_span("mcp.execute", attributes=attributes):
+                return await self._run(args=kwargs, cancellation_token=cancellation_token, session=session)
+
+
+async def get_tool_adapter(
+    server_params: StreamableHttpServerParams,
+    tool_name: str,
+    revalidate: bool = SCHEMA_REVALIDATE,
+) -> SchemaCachedToolAdapter:
+    """Build an adapter from the schema cache, falling back to the server on a miss.
+
+    The server's pooled sessions start opening in the background, so the
+    first call does not pay for the connection.
+    """
+    prewarm_in_background(server_params)
+    tool = await asyncio.to_thread(load_cached_tool, server_params.url, tool_name)
+
+    if tool is not None:
+        if revalidate:
+            revalidate_in_background(server_params)
+        return SchemaCachedToolAdapter(server_params=server_params, tool=tool)
+
+    tools = await fetch_tools(server_params)
+    tool = next((t for t in tools if t.name == tool_name), None)
+    if tool is None:
+        raise ValueError(f"Tool '{tool_name}' not found, available tools: {', '.join([t.name for t in tools])}")
+    return SchemaCachedToolAdapter(server_params=server_params, tool=tool)
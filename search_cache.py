@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from sqlite_store import connect_sqlite
+from tool_wrappers import DelegatingTool, decode_tool_result, encode_tool_result
+
+load_dotenv()
+
+# Search cache configuration
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))  # Max entries kept in memory
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))  # Seconds a result stays fresh
+SEARCH_CACHE_DB = os.getenv("SEARCH_CACHE_DB", "")  # SQLite path for the shared disk tier; empty disables it
+
+
+# Caches with an open SQLite connection, for close_search_caches()
+_open_caches: "weakref.WeakSet[SearchResultCache]" = weakref.WeakSet()
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a search query"""
+    return " ".join(query.lower().split())
+
+
+def cache_key(arguments: dict) -> str:
+    """Canonical key for a set of search arguments"""
+    arguments = dict(arguments)
+    if isinstance(arguments.get("query"), str):
+        arguments["query"] = normalize_query(arguments["query"])
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"))
+
+
+class SearchResultCache:
+    """Bounded in-memory LRU with TTL and an optional SQLite tier shared between processes.
+
+    The SQLite tier keeps one connection open until `close()`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_SIZE,
+        ttl: float = SEARCH_CACHE_TTL,
+        db_path: Optional[str] = SEARCH_CACHE_DB or None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        if self.db_path:
+            self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """The disk tier's connection, opened on first use; callers hold `_lock`"""
+        if self._conn is None:
+            self._conn = connect_sqlite(self.db_path, check_same_thread=False)
+            _open_caches.add(self)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+
+    def _disk_get(self, key: str) -> Optional[tuple[float, str]]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT expires_at, value FROM search_cache WHERE key = ?", (key,)).fetchone()
+        return row
+
+    def _disk_put(self, key: str, value: str, expires_at: float):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> tuple[bool, Any]:
+        """Return (found, value) for a key, consulting memory then disk"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+            self.expirations += 1
+
+        if self.db_path:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None and row[0] > now:
+                value = decode_tool_result(row[1])
+                self._remember(key, row[0], value)
+                self.hits += 1
+                self.disk_hits += 1
+                return True, value
+
+        self.misses += 1
+        return False, None
+
+    async def put(self, key: str, value: Any):
+        """Store a value in memory and, if enabled, on disk"""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self.db_path:
+            await asyncio.to_thread(self._disk_put, key, encode_tool_result(value), expires_at)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedSearchTool(DelegatingTool):
+    """Search tool wrapper that serves repeated queries from a SearchResultCache."""
+
+    def __init__(self, inner: BaseTool, cache: Optional[SearchResultCache] = None):
+        super().__init__(inner)
+        self.cache = cache or SearchResultCache()
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        key = cache_key(args.model_dump(exclude_unset=True))
+        found, value = await self.cache.get(key)
+        if found:
+            return value
+
+        # Errors are raised by the inner tool and therefore never cached
+        value = await self._inner.run(args, cancellation_token)
+        await self.cache.put(key, value)
+        return value
+
+
+def with_search_cache(tool: BaseTool) -> BaseTool:
+    """Wrap a search tool with the result cache if caching is enabled"""
+    return CachedSearchTool(tool) if SEARCH_CACHE_ENABLED else tool
+
+
+def close_search_caches():
+    """Close the SQLite connections of every search cache in the process"""
+    for cache in list(_open_caches):
+        cache.close()
+
+
+def format_cache_stats(tool: BaseTool) -> Optional[str]:
+    """One-line summary of a cached search tool's counters, if it has a cache"""
+    while tool is not None and not isinstance(tool, CachedSearchTool):
+        tool = getattr(tool, "inner", None)
+    if tool is None:
+        return None
+    stats = tool.cache.stats()
+    return (
+        f"📊 Search cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+        f"{stats['misses']} misses, {stats['evictions']} evictions, hit rate {stats['hit_rate']:.0%}"
+    )
@@ -0,0 +1,302 @@
+import asyncio
+import contextlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import uvicorn
+from autogen_agentchat.teams import RoundRobinGroupChat
+from dotenv import load_dotenv
+from sse_starlette import EventSourceResponse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from autogen_mcp_agent import AutoGenMCPAgent
+from deadline import PartialAnswer, QueryCancellation, release_team, until_cancelled
+from event_sink import serialize_event
+from http_pool import close_http_pool
+from mcp_pool import close_mcp_pools
+from model_client import close_model_client
+from search_cache import close_search_caches
+from tracing import query_span, setup_tracing, traced_stream
+
+load_dotenv()
+
+# Server configuration
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "100"))  # Sessions kept in memory
+SERVER_SESSION_IDLE = float(os.getenv("SERVER_SESSION_IDLE", "1800"))  # Idle seconds before a session is spilled
+SERVER_SESSION_DIR = os.path.expanduser(os.getenv("SERVER_SESSION_DIR", "~/.cache/autogen_mcp/sessions"))
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class Session:
+    """One user's conversation: its own team, serialized by a lock"""
+
+    def __init__(self, team: RoundRobinGroupChat):
+        self.team = team
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.pending = 0  # Requests holding this session, including ones waiting for the lock
+        self.restore_state: Optional[dict] = None  # Pre-turn state to load after a cancelled turn
+
+    def replace_team(self, team: RoundRobinGroupChat, state: dict):
+        """Swap in a fresh team after a cancelled turn; `state` is loaded before the next turn"""
+        self.team = team
+        self.restore_state = state
+
+    async def restore(self):
+        if self.restore_state is not None:
+            state, self.restore_state = self.restore_state, None
+            await self.team.load_state(state)
+
+    @property
+    def busy(self) -> bool:
+        return self.pending > 0 or self.lock.locked()
+
+
+def _read_spill(path: str) -> Optional[dict]:
+    """A spilled session's state, removing the file, or None if it was never spilled"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    os.remove(path)
+    return state
+
+
+def _write_spill(path: str, state: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def _remove_spill(path: str):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+class SessionPool:
+    """LRU of live sessions; evicted sessions are spilled to disk and restored on demand.
+
+    Every session has its own RoundRobinGroupChat state while sharing the
+    agent's model client and MCP tools. Spill files are read and written in
+    worker threads, so other sessions keep streaming meanwhile.
+    """
+
+    def __init__(
+        self,
+        agent: AutoGenMCPAgent,
+        max_sessions: int = SERVER_MAX_SESSIONS,
+        idle_timeout: float = SERVER_SESSION_IDLE,
+        spill_dir: str = SERVER_SESSION_DIR,
+    ):
+        self.agent = agent
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.spill_dir = spill_dir
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._spilling: dict[str, asyncio.Future] = {}  # Spill files being written, by session id
+        self.spilled = 0
+        self.restored = 0
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id}.json")
+
+    async def get(self, session_id: str) -> Session:
+        """Return a live session, restoring it from disk or creating it if needed.
+
+        The session is returned pending, so no eviction can spill it; the caller
+        decrements `pending` when its request is done.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.pending += 1
+        else:
+            session = Session(self.agent.create_team())
+            self._sessions[session_id] = session
+            session.pending += 1
+            try:
+                # Hold the lock so no turn runs before the state is back
+                async with session.lock:
+                    spilling = self._spilling.get(session_id)
+                    if spilling is not None:
+                        await asyncio.wait([spilling])  # Evicted a moment ago: let its state reach the disk
+                    state = await asyncio.to_thread(_read_spill, self._spill_path(session_id))
+                    if state is not None:
+                        await session.team.load_state(state)
+                        self.restored += 1
+                await self._evict_over_capacity()
+            except BaseException:
+                session.pending -= 1
+                raise
+
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    async def _spill(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return  # Spilled by a concurrent eviction
+        write = asyncio.ensure_future(self._write_state(session_id, session))
+        self._spilling[session_id] = write
+        try:
+            await write
+        finally:
+            if self._spilling.get(session_id) is write:
+                del self._spilling[session_id]
+        self.spilled += 1
+
+    async def _write_state(self, session_id: str, session: Session):
+        state = session.restore_state or await session.team.save_state()
+        await asyncio.to_thread(_write_spill, self._spill_path(session_id), state)
+
+    async def _evict_over_capacity(self):
+        # Least recently used first; sessions in the middle of a turn are skipped
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            session = self._sessions.get(session_id)
+            if session is not None and not session.busy:
+                await self._spill(session_id)
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.idle_timeout and not session.busy:
+                await self._spill(session_id)
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        spilling = self._spilling.get(session_id)
+        if spilling is not None:
+            await asyncio.wait([spilling])
+        await asyncio.to_thread(_remove_spill, self._spill_path(session_id))
+
+    async def spill_all(self):
+        for session_id in list(self._sessions):
+            await self._spill(session_id)
+
+    def stats(self) -> dict:
+        return {"live": len(self._sessions), "spilled": self.spilled, "restored": self.restored}
+
+
+pool: Optional[SessionPool] = None
+
+
+async def post_message(request: Request):
+    session_id = request.path_params["session_id"]
+    if not SESSION_ID_PATTERN.match(session_id):
+        return JSONResponse({"error": "invalid session id"}, status_code=400)
+    try:
+        body = await request.json()
+    except ValueError:  # Malformed JSON, or bytes that are not valid UTF-8
+        return JSONResponse({"error": "body must be JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "body must be a JSON object"}, status_code=400)
+    message = body.get("message")
+    message = message.strip() if isinstance(message, str) else ""
+    if not message:
+        return JSONResponse({"error": "message is required"}, status_code=400)
+
+    async def events():
+        session = await pool.get(session_id)
+        try:
+            async with session.lock:
+                await session.restore()
+                cancellation = QueryCancellation()
+                partial = PartialAnswer()
+                state = await session.team.save_state()
+                try:
+                    with query_span(message):
+                        stream = session.team.run_stream(task=message, cancellation_token=cancellation.token)
+                        async for event in traced_stream(partial.watch(until_cancelled(stream, cancellation))):
+                            data = serialize_event(event)
+                            yield {"event": data["type"], "data": json.dumps(data, ensure_ascii=False)}
+                except (asyncio.CancelledError, GeneratorExit) as e:
+                    # A cancelled team cannot run again: the next turn continues from the state before this one
+                    release_team(session.team)
+                    session.replace_team(pool.agent.create_team(), state)
+                    if isinstance(e, GeneratorExit) or not cancellation.expired:
+                        # Client went away: stop the model and tool calls of this turn
+                        cancellation.cancel()
+                        raise
+                    data = {"deadline_s": cancellation.deadline, "partial": partial.text}
+                    yield {"event": "deadline", "data": json.dumps(data, ensure_ascii=False)}
+                except Exception as e:
+                    yield {"event": "error", "data": json.dumps({"error": str(e)})}
+                finally:
+                    cancellation.close()
+        finally:
+            session.pending -= 1
+            session.last_used = time.monotonic()
+
+    return EventSourceResponse(events())
+
+
+async def delete_session(request: Request):
+    session_id = request.path_params["session_id"]
+    if not SESSION_ID_PATTERN.match(session_id):
+        return JSONResponse({"error": "invalid session id"}, status_code=400)
+    await pool.delete(session_id)
+    return JSONResponse({"deleted": session_id})
+
+
+async def stats(request: Request):
+    return JSONResponse({"sessions": pool.stats(), "model": pool.agent.model_client.stats()})
+
+
+async def health(request: Request):
+    return JSONResponse({"status": "ok"})
+
+
+async def _sweep_idle_sessions():
+    while True:
+        await asyncio.sleep(min(60.0, SERVER_SESSION_IDLE))
+        await pool.evict_idle()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    global pool
+    setup_tracing()
+    agent = AutoGenMCPAgent()
+    if not await agent.initialize():
+        raise RuntimeError("Failed to initialize the agent. Please check your configuration.")
+    pool = SessionPool(agent)
+    sweeper = asyncio.create_task(_sweep_idle_sessions())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        await pool.spill_all()
+        await close_model_client()
+        await close_http_pool()
+        await close_mcp_pools()
+        close_search_caches()
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/stats", stats),
+        Route("/sessions/{session_id}/messages", post_message, methods=["POST"]),
+        Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from batch_runner import BATCH_CONCURRENCY, iter_queries, load_completed_ids, run_batch
+from model_client import create_model_client
+
+load_dotenv()
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+
+async def _setup_agent(agent_name: str, workers: int):
+    """Create the model client, tools and team factory for one worker process"""
+    # Workers split the account's rate limits evenly
+    model_client = create_model_client(budget_share=1.0 / workers)
+
+    if agent_name == "gemini":
+        import gemini_compatible_agent as module
+
+        tools = await module.setup_tools()
+    else:
+        import multi_tool_agent as module
+
+        tools = await module.setup_mcp_tools()
+
+    if not tools:
+        raise RuntimeError("failed to set up tools")
+    return model_client, lambda: module.create_team(model_client, tools)
+
+
+async def _run_shard(agent_name: str, workers: int, records: list[dict], shard_output: str, concurrency: int) -> dict:
+    from http_pool import close_http_pool
+    from mcp_pool import close_mcp_pools
+    from search_cache import close_search_caches
+    from tracing import setup_tracing
+
+    setup_tracing()
+    model_client, create_team = await _setup_agent(agent_name, workers)
+    try:
+        return await run_batch(None, shard_output, create_team, concurrency=concurrency, records=iter(records))
+    finally:
+        await model_client.close()
+        await close_http_pool()
+        await close_mcp_pools()
+        close_search_caches()
+
+
+def run_shard(
+    agent_name: str, shard_index: int, workers: int, records: list[dict], shard_output: str, concurrency: int
+) -> dict:
+    """Worker process entry point: its own event loop, model client and MCP sessions"""
+    stats = asyncio.run(_run_shard(agent_name, workers, records, shard_output, concurrency))
+    stats["worker"] = shard_index
+    stats["records"] = len(records)
+    return stats
+
+
+def shard_path(output_path: str, shard_index: int) -> str:
+    return f"{output_path}.shard{shard_index}"
+
+
+def checkpoint_paths(output_path: str) -> list[str]:
+    """The merged output and every shard file next to it, whatever worker count wrote them"""
+    paths = sorted(glob.glob(f"{glob.escape(output_path)}.shard*"))
+    return ([output_path] if os.path.exists(output_path) else []) + paths
+
+
+def load_checkpoints(output_path: str) -> set[str]:
+    """Ids answered successfully by any earlier run, sharded or merged"""
+    completed = set()
+    for path in checkpoint_paths(output_path):
+        completed |= load_completed_ids(path)
+    return completed
+
+
+def merge_shards(records: list[dict], output_path: str):
+    """Merge the merged output of earlier runs and all shard outputs into one file in input order.
+
+    A successful result is kept over any failed one for the same id.
+    """
+    results = {}
+    for path in checkpoint_paths(output_path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                previous = results.get(result["id"])
+                if previous is None or previous["status"] != "ok":
+                    results[result["id"]] = result
+
+    with open(output_path, "w", encoding="utf-8") as output:
+        for record in records:
+            if record["id"] in results:
+                output.write(json.dumps(results[record["id"]], ensure_ascii=False) + "\n")
+
+
+def run_sharded_batch(
+    input_path: str,
+    output_path: str,
+    agent_name: str = "multi",
+    workers: int = BATCH_WORKERS,
+    concurrency: int = BATCH_CONCURRENCY,
+) -> list[dict]:
+    """Shard the input across worker processes and merge their results.
+
+    Queries already answered in any shard file or the merged output are
+    skipped, so a run can resume with a different number of workers; the
+    rest are dealt round-robin so every shard sees a similar mix of queries.
+    Each shard appends to its own output file. Returns per-worker statistics.
+    """
+    records = list(iter_queries(input_path))
+    completed = load_checkpoints(output_path)
+    pending = [record for record in records if record["id"] not in completed]
+    if len(pending) < len(records):
+        print(f"⏩ Resuming: {len(records) - len(pending)} queries already done")
+    shards = [pending[i::workers] for i in range(workers)]
+
+    start = time.perf_counter()
+    # Spawn gives every worker a clean interpreter and event loop
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(run_shard, agent_name, i, workers, shard, shard_path(output_path, i), concurrency)
+            for i, shard in enumerate(shards)
+            if shard
+        ]
+        worker_stats = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    merge_shards(records, output_path)
+
+    print("\n" + "=" * 50)
+    for stats in worker_stats:
+        print(
+            f"👷 Worker {stats['worker']}: {stats['ok']} ok, {stats['error']} failed, {stats['timeout']} timed out, "
+            f"{stats['skipped']} skipped → {stats['queries_per_minute']:.1f} queries/min"
+        )
+    done = sum(stats["ok"] + stats["error"] + stats["timeout"] for stats in worker_stats)
+    if worker_stats:
+        print(f"📊 {done} queries in {elapsed:.1f}s across {len(worker_stats)} workers → {done / elapsed * 60:.1f} queries/min")
+    return worker_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL query file across several worker processes")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"query\"} object per line")
+    parser.add_argument("output", help="Merged JSONL output; shard checkpoints are written next to it")
+    parser.add_argument("--agent", choices=["multi", "gemini"], default="multi")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Concurrent queries per worker")
+    args = parser.parse_args()
+
+    run_sharded_batch(args.input, args.output, args.agent, args.workers, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ import os
 from dotenv import load_dotenv
 from urllib.parse import urlencode
 from autogen_agentchat.teams import RoundRobinGroupChat
+from model_client import MODEL_STREAM, get_model_client
 
 load_dotenv()
 
@@ -35,11 +36,8 @@ async def main() -> None:
         server_params, "search"
     )
 
-    # Create model client (same as your original)
-    model_client = OpenAIChatCompletionClient(
-        model="gemini-1.5-flash-8b",
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
+    # Create model client (shared and rate limited)
+    model_client = get_model_client()
 
     # Create search agent with MCP tool
     search_agent = AssistantAgent(
@@ -47,6 +45,7 @@ async def main() -> None:
         model_client=model_client,
         tools=[search_adapter],
         system_message="You are a helpful web search agent. Use the search tool to find information based on user queries and provide comprehensive answers.",
+        model_client_stream=MODEL_STREAM,
     )
     
     # Create user proxy agent (simplified for AutoGen 0.7.4)
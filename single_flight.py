@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from tool_wrappers import DelegatingTool
+
+load_dotenv()
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def canonical_arguments(arguments: dict) -> str:
+    """Key for tool arguments: sorted keys, whitespace-collapsed strings"""
+    normalized = {
+        name: " ".join(value.split()) if isinstance(value, str) else value
+        for name, value in arguments.items()
+    }
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task, token: CancellationToken):
+        self.task = task
+        self.token = token
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight call.
+
+    The shared call runs in its own task with its own cancellation token. A
+    waiter that is cancelled only stops waiting; the shared call is cancelled
+    once no waiters are left. Results and errors are delivered to every waiter.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[CancellationToken], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            token = CancellationToken()
+            task = asyncio.ensure_future(fn(token))
+            flight = _Flight(task, token)
+            self._flights[key] = flight
+            task.add_done_callback(lambda t, key=key, flight=flight: self._finish(key, flight))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Everybody stopped waiting: abandon the shared call
+                flight.token.cancel()
+                flight.task.cancel()
+
+    def _finish(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception as retrieved when every waiter already left
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+class SingleFlightTool(DelegatingTool):
+    """Tool wrapper that shares one upstream call between identical concurrent calls."""
+
+    def __init__(self, inner: BaseTool, key_fn: Callable[[dict], str] = canonical_arguments):
+        super().__init__(inner)
+        self.key_fn = key_fn
+        self.flights = SingleFlight()
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        key = self.key_fn(args.model_dump(exclude_unset=True))
+        # The caller's token only stops this caller's wait; the shared call has its own
+        wait = asyncio.ensure_future(self.flights.do(key, lambda token: self._inner.run(args, token)))
+        cancellation_token.link_future(wait)
+        return await wait
+
+
+def with_single_flight(tool: BaseTool, key_fn: Optional[Callable[[dict], str]] = None) -> BaseTool:
+    """Wrap a tool with request coalescing if enabled"""
+    if not SINGLE_FLIGHT_ENABLED:
+        return tool
+    return SingleFlightTool(tool, key_fn=key_fn or canonical_arguments)
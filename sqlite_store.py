@@ -0,0 +1,28 @@
+import os
+import sqlite3
+from typing import Iterable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# SQLite configuration shared by the completion cache, the search cache and the local index
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))  # Seconds to wait for another process's lock
+
+
+def connect_sqlite(path: str, pragmas: Iterable[str] = (), **kwargs) -> sqlite3.Connection:
+    """Open a database that several processes (e.g. batch shards) read and write at once.
+
+    The connection waits up to SQLITE_BUSY_TIMEOUT for a lock held by another
+    process instead of failing with "database is locked", and the database is
+    switched to WAL so readers never block the writer. `pragmas` run first,
+    for settings such as auto_vacuum that must precede the switch.
+    """
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, **kwargs)
+    conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT * 1000)}")
+    for pragma in pragmas:
+        conn.execute(f"PRAGMA {pragma}")
+    # Already WAL after the first connection: skip the switch, which needs an exclusive lock
+    if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+        conn.execute("PRAGMA journal_mode=WAL")
+    return conn
@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+IMAGE_INTENT = re.compile(r"\b(image|picture|photo|draw|paint|illustrat\w*|generate|create)\b", re.IGNORECASE)
+
+
+class AcceptAnyMiddleware:
+    """Let plain JSON-RPC posts (like generate_image_url's) through the MCP Accept check"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = [(name, value) for name, value in scope["headers"] if name != b"accept"]
+            headers.append((b"accept", b"application/json, text/event-stream"))
+            scope = dict(scope, headers=headers)
+        await self.app(scope, receive, send)
+
+
+def create_mcp_app(latency: float = 0.05, results: int = 5) -> Starlette:
+    """Streamable-HTTP MCP server with stand-ins for the DuckDuckGo and Flux tools"""
+    mcp = FastMCP("stub-tools", stateless_http=True, json_response=True)
+
+    @mcp.tool()
+    async def search(query: str, max_results: int = 10) -> str:
+        """Search DuckDuckGo and return formatted results."""
+        await asyncio.sleep(latency)
+        count = min(max_results, results)
+        lines = [f"Found {count} search results:\n"]
+        for i in range(1, count + 1):
+            slug = hashlib.md5(f"{query}{i}".encode()).hexdigest()[:8]
+            lines.append(
+                f"{i}. Result {i} for {query}\n"
+                f"   URL: https://example.com/{slug}\n"
+                f"   Summary: Stub summary {i} about {query}. It repeats the query terms so relevance "
+                f"ranking has something to work with: {query}.\n"
+            )
+        return "\n".join(lines)
+
+    @mcp.tool(name="generateImageUrl")
+    async def generate_image_url(
+        prompt: str,
+        model: str = "flux",
+        seed: int | None = None,
+        width: int = 1024,
+        height: int = 1024,
+        enhance: bool = True,
+        safe: bool = False,
+    ) -> str:
+        """Generate an image URL from a text prompt"""
+        await asyncio.sleep(latency)
+        digest = hashlib.md5(f"{prompt}{model}{seed}{width}{height}".encode()).hexdigest()
+        return json.dumps({"imageUrl": f"https://image.example/{digest}.png", "prompt": prompt, "model": model})
+
+    app = mcp.streamable_http_app()
+    app.add_middleware(AcceptAnyMiddleware)
+    return app
+
+
+def _estimate_tokens(messages: list) -> int:
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + 1
+
+
+def _script_reply(body: dict) -> dict:
+    """Decide the fake model's reply: a tool call for a fresh user turn, text otherwise"""
+    messages = body.get("messages", [])
+    tools = [tool["function"]["name"] for tool in body.get("tools") or []]
+    last = messages[-1] if messages else {}
+    user_text = next(
+        (str(m.get("content")) for m in reversed(messages) if m.get("role") == "user"),
+        "",
+    )
+
+    if last.get("role") == "user" and last.get("name") == "fast_path":
+        # Tool output supplied up front by the fast-path router: answer from it
+        return {"text": f"Based on the tool results: {str(last.get('content'))[:200]}"}
+    if last.get("role") == "user" and tools:
+        image_tool = next((name for name in tools if "image" in name.lower()), None)
+        if image_tool and IMAGE_INTENT.search(user_text):
+            return {"tool": image_tool, "arguments": {"prompt": user_text}}
+        if "search" in tools:
+            return {"tool": "search", "arguments": {"query": user_text}}
+
+    tool_output = next((str(m.get("content")) for m in reversed(messages) if m.get("role") == "tool"), "")
+    if tool_output:
+        return {"text": f"Based on the tool results: {tool_output[:200]}"}
+    return {"text": f"Stub answer to: {user_text[:200]}"}
+
+
+def create_model_app(latency: float = 0.2, token_delay: float = 0.01) -> Starlette:
+    """OpenAI-compatible chat-completions server with fixed latency and scripted tool calls"""
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        reply = _script_reply(body)
+        prompt_tokens = _estimate_tokens(body.get("messages", []))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+
+        tool_calls = None
+        finish_reason = "stop"
+        text = reply.get("text")
+        if "tool" in reply:
+            finish_reason = "tool_calls"
+            tool_calls = [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": reply["tool"], "arguments": json.dumps(reply["arguments"])},
+            }]
+        words = text.split(" ") if text else []
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words) or 1, "total_tokens": prompt_tokens + (len(words) or 1)}
+
+        await asyncio.sleep(latency)
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": text}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        def chunk(delta: dict, finish: str | None = None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            if tool_calls:
+                yield chunk({"tool_calls": [{"index": 0, **tool_calls[0]}]})
+            for i, word in enumerate(words):
+                await asyncio.sleep(token_delay)
+                yield chunk({"content": word if i == 0 else f" {word}"})
+            yield chunk({}, finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-ins for the MCP tool servers and the Gemini API")
+    parser.add_argument("server", choices=["mcp", "model"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency", type=float, default=None, help="Seconds before each response")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed chunks (model only)")
+    args = parser.parse_args()
+
+    if args.server == "mcp":
+        app = create_mcp_app(latency=0.05 if args.latency is None else args.latency)
+    else:
+        app = create_model_app(latency=0.2 if args.latency is None else args.latency, token_delay=args.token_delay)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import pytest
+
+from fast_path import IntentRouter
+
+router = IntentRouter(threshold=0.8)
+
+
+def routed_intent(query: str):
+    """The intent the fast path would route a query to at the default threshold, or None"""
+    intent, confidence, _ = router.classify(query)
+    return intent if confidence >= router.threshold else None
+
+
+@pytest.mark.parametrize(
+    "query, intent",
+    [
+        # Image requests
+        ("Create an image of a futuristic city", "image"),
+        ("Generate a picture showing a red fox in the snow", "image"),
+        ("Please make a watercolor painting of a lighthouse", "image"),
+        ("Can you design a poster with a retro sunset", "image"),
+        ("Draw a cat", "image"),
+        ("Draw a sunset over mountains", "image"),
+        ("Draw a cute robot playing with a cat", "image"),
+        ("sketch an old bridge at dusk", "image"),
+        # Look-ups
+        ("What's the latest news about AI?", "search"),
+        ("Who won the 2024 Nobel Prize in physics?", "search"),
+        ("What is the current population of Tokyo?", "search"),
+        ("Who won IPL 2025 final?", "search"),
+        ("When is the next total solar eclipse?", "search"),
+        ("Where is the Eiffel Tower?", "search"),
+        ("search for cheap flights to Lisbon", "search"),
+        ("weather in Paris tomorrow", "search"),
+        ("breaking news from Brussels", "search"),
+        # Left to the model
+        ("Create an image classifier in PyTorch", None),
+        ("Make the logo bigger", None),
+        ("Create a logo for a café", None),
+        ("Draw conclusions from this data", None),
+        ("Paint a picture of the economy for me", None),
+        ("How do I draw a picture of a horse?", None),
+        ("Today I feel sad, cheer me up", None),
+        ("When is it appropriate to use async in Python?", None),
+        ("Where is the bug in this function?", None),
+        ("Who are you?", None),
+        ("Find the bug in my code", None),
+        ("Write a poem about the latest news", None),
+        ("Tell me a joke", None),
+    ],
+)
+def test_routing(query, intent):
+    assert routed_intent(query) == intent
+
+
+@pytest.mark.parametrize(
+    "query, prompt",
+    [
+        ("Create an image of a futuristic city", "a futuristic city"),
+        ("Please make a watercolor painting of a lighthouse", "watercolor painting of a lighthouse"),
+        ("Can you design a poster with a retro sunset", "poster with a retro sunset"),
+        ("Draw a sunset over mountains.", "a sunset over mountains"),
+    ],
+)
+def test_image_prompt(query, prompt):
+    assert router.classify(query)[2] == {"prompt": prompt}
@@ -0,0 +1,51 @@
+import json
+from typing import Any
+
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool, ToolSchema
+from mcp.types import ContentBlock
+from pydantic import BaseModel, TypeAdapter
+
+_CONTENT_LIST = TypeAdapter(list[ContentBlock])
+
+
+def encode_tool_result(value: Any) -> str:
+    """Serialize a tool result (a string or a list of MCP content blocks) to JSON"""
+    if isinstance(value, str):
+        return json.dumps({"type": "str", "value": value})
+    return json.dumps({"type": "content", "value": _CONTENT_LIST.dump_python(value, mode="json")})
+
+
+def decode_tool_result(text: str) -> Any:
+    """Inverse of encode_tool_result"""
+    data = json.loads(text)
+    if data["type"] == "str":
+        return data["value"]
+    return _CONTENT_LIST.validate_python(data["value"])
+
+
+class DelegatingTool(BaseTool[BaseModel, Any]):
+    """Base class for tools that wrap another tool.
+
+    The wrapper advertises the same name, description and schema as the wrapped
+    tool and forwards `run` to it, so wrappers can be stacked (cache, retries,
+    ...) without the model seeing any difference.
+    """
+
+    def __init__(self, inner: BaseTool):
+        self._inner = inner
+        super().__init__(inner.args_type(), inner.return_type(), inner.name, inner.description)
+
+    @property
+    def inner(self) -> BaseTool:
+        return self._inner
+
+    @property
+    def schema(self) -> ToolSchema:
+        return self._inner.schema
+
+    async def run(self, args: BaseModel, cancellation_token: CancellationToken) -> Any:
+        return await self._inner.run(args, cancellation_token)
+
+    def return_value_as_string(self, value: Any) -> str:
+        return self._inner.return_value_as_string(value)
@@ -0,0 +1,316 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import AsyncGenerator, AsyncIterator, Iterator, Optional, TypeVar
+
+from dotenv import load_dotenv
+from opentelemetry import trace
+from opentelemetry.trace import SpanContext, SpanKind, Status, TraceFlags
+
+load_dotenv()
+
+# Tracing configuration
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_FILE = os.path.expanduser(os.getenv("TRACE_FILE", "~/.cache/autogen_mcp/traces.jsonl"))  # Empty disables export
+TRACE_SUMMARY = os.getenv("TRACE_SUMMARY", "true").lower() == "true"  # Print a phase summary after each query
+
+QUERY_ATTRIBUTE = "query.root"
+
+T = TypeVar("T")
+
+# Resolves to the local provider once setup_tracing() has run, and is a no-op before that
+tracer = trace.get_tracer("autogen_mcp")
+
+
+class RecordingSpan(trace.Span):
+    """A finished-or-running span kept in memory until its provider exports it"""
+
+    def __init__(self, name, context: SpanContext, parent_id: Optional[int], kind, attributes, start_time, provider, scope):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = "UNSET"
+        self.status_description = None
+        self.start_time = start_time or time.time_ns()
+        self.end_time = None
+        self.scope = scope
+        self.summary: Optional[dict] = None
+        self._provider = provider
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now, if still running)"""
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def end(self, end_time: Optional[int] = None) -> None:
+        if self.end_time is not None:
+            return
+        self.end_time = end_time or time.time_ns()
+        self._provider.on_end(self)
+
+    def get_span_context(self) -> SpanContext:
+        return self.context
+
+    def set_attributes(self, attributes) -> None:
+        self.attributes.update(attributes)
+
+    def set_attribute(self, key, value) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name, attributes=None, timestamp=None) -> None:
+        self.events.append({"name": name, "time": timestamp or time.time_ns(), "attributes": dict(attributes or {})})
+
+    def update_name(self, name) -> None:
+        self.name = name
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def set_status(self, status, description=None) -> None:
+        if isinstance(status, Status):
+            self.status, self.status_description = status.status_code.name, status.description
+        else:
+            self.status, self.status_description = status.name, description
+
+    def record_exception(self, exception, attributes=None, timestamp=None, escaped=False) -> None:
+        self.add_event(
+            "exception",
+            {"exception.type": type(exception).__name__, "exception.message": str(exception), **(attributes or {})},
+            timestamp,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": f"{self.context.trace_id:032x}",
+            "span_id": f"{self.context.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id else None,
+            "scope": self.scope,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class LocalTracer(trace.Tracer):
+    def __init__(self, provider: "LocalTracerProvider", scope: str):
+        self._provider = provider
+        self._scope = scope
+
+    def start_span(
+        self,
+        name,
+        context=None,
+        kind=SpanKind.INTERNAL,
+        attributes=None,
+        links=None,
+        start_time=None,
+        record_exception=True,
+        set_status_on_exception=True,
+    ) -> RecordingSpan:
+        parent = trace.get_current_span(context).get_span_context()
+        if parent.is_valid:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = random.getrandbits(128) or 1, None
+        span_context = SpanContext(
+            trace_id, random.getrandbits(64) or 1, is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)
+        )
+        span = RecordingSpan(name, span_context, parent_id, kind, attributes, start_time, self._provider, self._scope)
+        self._provider.on_start(span)
+        return span
+
+    @contextmanager
+    def start_as_current_span(
+        self,
+        name,
+        context=None,
+        kind=SpanKind.INTERNAL,
+        attributes=None,
+        links=None,
+        start_time=None,
+        record_exception=True,
+        set_status_on_exception=True,
+        end_on_exit=True,
+    ) -> Iterator[RecordingSpan]:
+        span = self.start_span(name, context, kind, attributes, links, start_time)
+        with trace.use_span(
+            span,
+            end_on_exit=end_on_exit,
+            record_exception=record_exception,
+            set_status_on_exception=set_status_on_exception,
+        ) as current:
+            yield current
+
+
+class FileSpanExporter:
+    """Append finished spans to a JSONL file from a background thread.
+
+    The event loop only enqueues the span; serialization and file I/O happen
+    on the writer thread, which drains the queue and appends each batch with a
+    single write, so several processes can share one file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span: RecordingSpan):
+        self._queue.put(span)
+
+    def _write(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                while not self._queue.empty():
+                    batch.append(self._queue.get())
+                lines = []
+                for span in batch:
+                    if span is None:
+                        running = False
+                        continue
+                    try:
+                        lines.append(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+                    except (TypeError, ValueError):
+                        continue
+                if lines:
+                    os.write(fd, "".join(lines).encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def shutdown(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+
+
+class LocalTracerProvider(trace.TracerProvider):
+    """In-process tracer provider: exports spans to a local file and summarizes each query.
+
+    Only the spans of traces rooted at a query_span() are kept in memory, and
+    only until that query ends.
+    """
+
+    def __init__(self, path: str = TRACE_FILE, summary: bool = TRACE_SUMMARY):
+        self.exporter = FileSpanExporter(path) if path else None
+        self.summary = summary
+        self._queries: dict[int, list[RecordingSpan]] = {}
+
+    def get_tracer(self, instrumenting_module_name, *args, **kwargs) -> LocalTracer:
+        return LocalTracer(self, instrumenting_module_name)
+
+    def on_start(self, span: RecordingSpan):
+        if span.parent_id is None and span.attributes.get(QUERY_ATTRIBUTE):
+            self._queries[span.context.trace_id] = []
+
+    def on_end(self, span: RecordingSpan):
+        if self.exporter is not None:
+            self.exporter.export(span)
+        spans = self._queries.get(span.context.trace_id)
+        if spans is None:
+            return
+        if span.parent_id is not None:
+            spans.append(span)
+            return
+        del self._queries[span.context.trace_id]
+        span.summary = summarize_query(span, spans)
+        if self.summary:
+            print(format_summary(span.summary))
+
+
+def summarize_query(root: RecordingSpan, spans: list[RecordingSpan]) -> dict:
+    """Time spent per phase in one query (phases can overlap when calls run concurrently)"""
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    ttft = None
+    completion_tokens, generation_time = 0, 0.0
+    for span in sorted(spans, key=lambda s: s.start_time):
+        if span.name.startswith("model."):
+            phase = "model"
+            if ttft is None and "model.ttft_ms" in span.attributes:
+                ttft = span.attributes["model.ttft_ms"] / 1000
+            if "model.generation_ms" in span.attributes:
+                completion_tokens += span.attributes["model.completion_tokens"]
+                generation_time += span.attributes["model.generation_ms"] / 1000
+        elif span.name.startswith("execute_tool"):
+            phase = "tools"
+        elif span.name in ("mcp.connect", "mcp.execute", "render"):
+            phase = span.name.split(".")[-1]
+        else:
+            continue
+        totals[phase] += span.duration
+        counts[phase] += 1
+    return {
+        "total": root.duration,
+        "ttft": ttft,
+        "tps": completion_tokens / generation_time if generation_time > 0 else None,
+        **{phase: round(seconds, 4) for phase, seconds in totals.items()},
+        **{f"{phase}_count": count for phase, count in counts.items()},
+    }
+
+
+def format_summary(summary: dict) -> str:
+    parts = [f"⏱️ {summary['total']:.2f}s total"]
+    if "model" in summary:
+        ttft = f", TTFT {summary['ttft']:.2f}s" if summary.get("ttft") is not None else ""
+        tps = f", {summary['tps']:.0f} tok/s" if summary.get("tps") else ""
+        parts.append(f"model {summary['model']:.2f}s ×{summary['model_count']}{ttft}{tps}")
+    if "tools" in summary:
+        mcp = ""
+        if "connect" in summary or "execute" in summary:
+            mcp = f" (connect {summary.get('connect', 0.0):.2f}s, execute {summary.get('execute', 0.0):.2f}s)"
+        parts.append(f"tools {summary['tools']:.2f}s ×{summary['tools_count']}{mcp}")
+    if "render" in summary:
+        parts.append(f"render {summary['render']:.3f}s")
+    return " | ".join(parts)
+
+
+_provider: Optional[LocalTracerProvider] = None
+
+
+def setup_tracing() -> Optional[LocalTracerProvider]:
+    """Install the local tracer provider for this process (once); returns None if tracing is disabled"""
+    global _provider
+    if not TRACING_ENABLED:
+        return None
+    if _provider is None:
+        # Per-message runtime spans are too chatty to leave on; the agent and tool spans stay
+        os.environ.setdefault("AUTOGEN_DISABLE_RUNTIME_TRACING", "true")
+        _provider = LocalTracerProvider()
+        trace.set_tracer_provider(_provider)
+    return _provider
+
+
+@contextmanager
+def query_span(query: str) -> Iterator[trace.Span]:
+    """Root span for one user query; its phase summary is printed and stored on the span when it ends"""
+    with tracer.start_as_current_span(
+        "query", context=trace.set_span_in_context(trace.INVALID_SPAN),
+        attributes={QUERY_ATTRIBUTE: True, "query.text": query[:200]},
+    ) as span:
+        yield span
+
+
+async def traced_stream(stream: AsyncIterator[T]) -> AsyncGenerator[T, None]:
+    """Pass `stream` through, recording the time the consumer spends on each item as a render span"""
+    async for item in stream:
+        start = time.time_ns()
+        yield item
+        tracer.start_span("render", start_time=start).end()